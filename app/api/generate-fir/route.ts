@@ -48,7 +48,7 @@ Witness Information: ${witnesses}
     console.log("Input file:", inputFilePath)
     
     const { stdout, stderr } = await execAsync(
-      `python ${scriptPath} "${inputFilePath}"`
+      `python ${scriptPath} "${inputFilePath}" --format json --no-echo --omit debug`
     )
 
     // Clean up the input file
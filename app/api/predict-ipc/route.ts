@@ -58,7 +58,7 @@ Case Description: ${caseDescription}`
       const cwd = path.join(process.cwd(), "legal_model")
       console.log("Working directory:", cwd)
       
-      const command = `cd "${cwd}" && python direct_analyze.py "${inputFileName}"`
+      const command = `cd "${cwd}" && python direct_analyze.py "${inputFileName}" --format json --no-echo`
       console.log("Executing command:", command)
       
       const { stdout, stderr } = await execAsync(
@@ -1,72 +1,24 @@
 import numpy as np
-import json
 import re
-import pickle
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+from direct_analyze import load_active_model
+from party_extractor import extract_parties
+from text_normalizer import normalize_text, normalizer_for_config
+
 def preprocess_text(text):
     """Clean and preprocess text"""
-    # Convert to lowercase
-    text = text.lower()
-    # Remove special characters but keep spaces between words
-    text = re.sub(r'[^a-zA-Z\s]', ' ', text)
-    # Remove extra whitespace
-    text = ' '.join(text.split())
-    return text
-
-def extract_parties(text):
-    """Extract only the relevant parties (people) from the case text"""
-    parties = []
-    
-    # Find standard Person A/B/C references
-    person_pattern = r'(person\s+[A-Za-z])\b'
-    matches = re.findall(person_pattern, text, re.IGNORECASE)
-    for match in matches:
-        if match.lower() not in [p.lower() for p in parties]:
-            parties.append(match.title())
-    
-    # Find names that look like actual person names (two capitalized words)
-    name_pattern = r'\b([A-Z][a-z]+\s+[A-Z][a-z]+)\b'
-    matches = re.findall(name_pattern, text)
-    for match in matches:
-        if match.lower() not in [p.lower() for p in parties]:
-            parties.append(match)
-    
-    # Find references to "the accused", "the victim", etc.
-    role_patterns = [r'\b(the\s+accused)\b', r'\b(the\s+victim)\b', r'\b(the\s+complainant)\b']
-    for pattern in role_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for match in matches:
-            if match.lower() not in [p.lower() for p in parties]:
-                parties.append(match.title())
-    
-    # If no parties found, but case has standard terminology
-    if not parties:
-        if "accused" in text.lower():
-            parties.append("The Accused")
-        if "victim" in text.lower():
-            parties.append("The Victim")
-    
-    return parties
+    return normalize_text(text)
 
 def analyze_case(case_text):
     """Analyze a legal case and identify relevant IPC sections with detailed explanation"""
     try:
-        # Load the RandomForest model and its components
-        with open('rf_classifier.pkl', 'rb') as f:
-            clf = pickle.load(f)
-        
-        with open('tfidf_vectorizer.pkl', 'rb') as f:
-            vectorizer = pickle.load(f)
-            
-        with open('label_encoder.pkl', 'rb') as f:
-            label_encoder = pickle.load(f)
-            
-        with open('model_config.json', 'r') as f:
-            config = json.load(f)
+        # The RandomForest the other analyzers serve: the registry's current version,
+        # else the bundle or the pickles next to direct_analyze.py
+        (clf, vectorizer, label_encoder, config), _ = load_active_model()
         
-        # Preprocess the case text
-        processed_text = preprocess_text(case_text)
+        # Preprocess the case text the way the model was trained
+        processed_text = normalizer_for_config(config)(case_text)
         
         # Vectorize the text
         text_vector = vectorizer.transform([processed_text])
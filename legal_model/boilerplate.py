@@ -0,0 +1,229 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+from array import array
+from collections import Counter
+
+from case_data import list_case_files, iter_corpus, text_fields_for
+
+# Mask file layout: magic, format version, shingle size, shingle count, then sorted uint64 hashes
+MASK_MAGIC = b"LLBM"
+MASK_VERSION = 1
+MASK_HEADER = struct.Struct("<4sBHI")
+
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_MIN_DOC_FRACTION = 0.3
+DEFAULT_MIN_DOCS = 3
+
+TOKEN_PATTERN = re.compile(r"\S+")
+
+def shingle_hash(words):
+    """Stable 64-bit hash of a run of lowercased words"""
+    digest = hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+def tokenize(text):
+    """Split text into whitespace tokens, keeping their character spans"""
+    spans = []
+    words = []
+    for match in TOKEN_PATTERN.finditer(text):
+        spans.append((match.start(), match.end()))
+        words.append(match.group().lower())
+    return words, spans
+
+def iter_shingles(words, k):
+    """Yield (start token index, hash) for every k-token window"""
+    for i in range(len(words) - k + 1):
+        yield i, shingle_hash(words[i:i + k])
+
+class BoilerplateMask:
+    """Set of shingle hashes that occur in a large share of the corpus"""
+
+    def __init__(self, hashes, shingle_size=DEFAULT_SHINGLE_SIZE):
+        self.shingle_size = shingle_size
+        self.hashes = set(hashes)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def save(self, path):
+        """Write the mask as a compact binary file"""
+        values = array("Q", sorted(self.hashes))
+        if sys.byteorder != "little":
+            values.byteswap()
+        with open(path, "wb") as f:
+            f.write(MASK_HEADER.pack(MASK_MAGIC, MASK_VERSION, self.shingle_size, len(values)))
+            values.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        """Read a mask written by save()"""
+        with open(path, "rb") as f:
+            magic, version, shingle_size, count = MASK_HEADER.unpack(f.read(MASK_HEADER.size))
+            if magic != MASK_MAGIC or version != MASK_VERSION:
+                raise ValueError(f"{path} is not a boilerplate mask (version {MASK_VERSION})")
+            values = array("Q")
+            values.fromfile(f, count)
+        if sys.byteorder != "little":
+            values.byteswap()
+        return cls(values, shingle_size)
+
+def learn_mask(texts, shingle_size=DEFAULT_SHINGLE_SIZE, min_doc_fraction=DEFAULT_MIN_DOC_FRACTION,
+               min_docs=DEFAULT_MIN_DOCS):
+    """Learn boilerplate shingles from an iterable of texts in one pass
+
+    A shingle is boilerplate when it appears in at least min_doc_fraction of the
+    distinct texts (and in at least min_docs of them). Identical texts are only
+    counted once, since the training CSVs repeat each judgment per IPC section.
+    """
+    doc_freq = Counter()
+    seen_texts = set()
+
+    for text in texts:
+        if not text:
+            continue
+        text_digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        if text_digest in seen_texts:
+            continue
+        seen_texts.add(text_digest)
+
+        words, _ = tokenize(text)
+        doc_freq.update({h for _, h in iter_shingles(words, shingle_size)})
+
+    threshold = max(min_docs, min_doc_fraction * len(seen_texts))
+    hashes = [h for h, count in doc_freq.items() if count >= threshold]
+    return BoilerplateMask(hashes, shingle_size), len(seen_texts)
+
+def strip_text(text, mask):
+    """Remove masked shingles from text
+
+    Returns the cleaned text and the UTF-8 byte offsets, in the original text,
+    of the spans that were kept.
+    """
+    if not text:
+        return "", []
+
+    k = mask.shingle_size
+    words, spans = tokenize(text)
+    masked = [False] * len(words)
+    for i, h in iter_shingles(words, k):
+        if h in mask.hashes:
+            for j in range(i, i + k):
+                masked[j] = True
+
+    # Merge runs of kept tokens into character spans of the original text
+    kept = []
+    run_start = None
+    for i, is_masked in enumerate(masked):
+        if not is_masked and run_start is None:
+            run_start = spans[i][0]
+        elif is_masked and run_start is not None:
+            kept.append((run_start, spans[i - 1][1]))
+            run_start = None
+    if run_start is not None:
+        kept.append((run_start, spans[-1][1]))
+
+    # Convert character offsets to byte offsets incrementally
+    offsets = []
+    byte_pos = 0
+    char_pos = 0
+    for start, end in kept:
+        byte_pos += len(text[char_pos:start].encode("utf-8"))
+        byte_start = byte_pos
+        byte_pos += len(text[start:end].encode("utf-8"))
+        offsets.append([byte_start, byte_pos])
+        char_pos = end
+
+    cleaned = " ".join(text[start:end] for start, end in kept)
+    return cleaned, offsets
+
+def strip_record(record, mask, fields):
+    """Clean the text fields of a record, recording kept byte offsets per field"""
+    cleaned = dict(record)
+    offsets = {}
+    for field in fields:
+        if record.get(field):
+            cleaned[field], offsets[field] = strip_text(record[field], mask)
+    cleaned["clean_offsets"] = offsets
+    return cleaned
+
+def strip_records(records, mask, fields):
+    """Lazily clean a stream of records"""
+    for record in records:
+        yield strip_record(record, mask, fields)
+
+def learn_from_files(paths, **kwargs):
+    """Learn a mask from the text fields of case data files"""
+    def texts():
+        for path, record in iter_corpus(paths):
+            for field in text_fields_for(path):
+                yield record.get(field, "")
+    return learn_mask(texts(), **kwargs)
+
+def clean_files(paths, mask, output_path):
+    """Stream records from case data files into a cleaned JSON Lines file"""
+    bytes_in = 0
+    bytes_out = 0
+    count = 0
+
+    with open(output_path, "w", encoding="utf-8") as out:
+        for path, record in iter_corpus(paths):
+            fields = text_fields_for(path)
+            cleaned = strip_record(record, mask, fields)
+            cleaned["source_file"] = os.path.basename(path)
+            for field in fields:
+                bytes_in += len((record.get(field) or "").encode("utf-8"))
+                bytes_out += len((cleaned.get(field) or "").encode("utf-8"))
+            out.write(json.dumps(cleaned, ensure_ascii=False) + "\n")
+            count += 1
+
+    return {"records": count, "text_bytes_in": bytes_in, "text_bytes_out": bytes_out}
+
+def resolve_inputs(inputs):
+    """Default to every scraped JSON file and training CSV when no inputs are given"""
+    if inputs:
+        return inputs
+    return list_case_files("*.json") + list_case_files("training_data_*.csv")
+
+def main():
+    parser = argparse.ArgumentParser(description="Learn and strip scraped site boilerplate from case text")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    learn_parser = subparsers.add_parser("learn", help="Learn a boilerplate mask from the corpus")
+    learn_parser.add_argument("inputs", nargs="*", help="Case data files (defaults to the bundled data)")
+    learn_parser.add_argument("--mask", default="boilerplate_mask.bin", help="Where to write the mask")
+    learn_parser.add_argument("--shingle-size", type=int, default=DEFAULT_SHINGLE_SIZE)
+    learn_parser.add_argument("--min-doc-fraction", type=float, default=DEFAULT_MIN_DOC_FRACTION)
+    learn_parser.add_argument("--min-docs", type=int, default=DEFAULT_MIN_DOCS)
+
+    clean_parser = subparsers.add_parser("clean", help="Strip boilerplate from case data files")
+    clean_parser.add_argument("inputs", nargs="*", help="Case data files (defaults to the bundled data)")
+    clean_parser.add_argument("--mask", default="boilerplate_mask.bin", help="Mask written by 'learn'")
+    clean_parser.add_argument("--output", default="cleaned_cases.jsonl", help="Output JSON Lines file")
+
+    args = parser.parse_args()
+    paths = resolve_inputs(args.inputs)
+
+    if args.command == "learn":
+        mask, num_texts = learn_from_files(
+            paths,
+            shingle_size=args.shingle_size,
+            min_doc_fraction=args.min_doc_fraction,
+            min_docs=args.min_docs
+        )
+        mask.save(args.mask)
+        print(f"Learned {len(mask)} boilerplate shingles from {num_texts} distinct texts")
+        print(f"Mask saved to {args.mask} ({os.path.getsize(args.mask)} bytes)")
+    else:
+        mask = BoilerplateMask.load(args.mask)
+        stats = clean_files(paths, mask, args.output)
+        saved = stats["text_bytes_in"] - stats["text_bytes_out"]
+        print(f"Cleaned {stats['records']} records into {args.output}")
+        print(f"Text bytes: {stats['text_bytes_in']} -> {stats['text_bytes_out']} ({saved} removed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import json
+import os
+import sys
+import threading
+import time
+
+from direct_analyze import analyze_case, extract_case_description
+
+DEFAULT_THRESHOLD = 60.0  # Percent confidence above which the classifier answer is final
+
+# legal_analyzer.py and its client live in the sibling pinggg-legal-model directory
+LLM_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pinggg-legal-model")
+
+class CascadeStats:
+    """Escalation rate and latency split across cascade calls"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cases = 0
+        self.escalated = 0
+        self.reasons = {}
+        self.classifier_ms = 0.0
+        self.llm_ms = 0.0
+
+    def record(self, result):
+        with self._lock:
+            self.cases += 1
+            self.classifier_ms += result["timing"]["classifier_ms"]
+            self.llm_ms += result["timing"]["llm_ms"]
+            if result["escalated"]:
+                self.escalated += 1
+                self.reasons[result["reason"]] = self.reasons.get(result["reason"], 0) + 1
+
+    def summary(self):
+        with self._lock:
+            total_ms = self.classifier_ms + self.llm_ms
+            return {
+                "cases": self.cases,
+                "escalated": self.escalated,
+                "escalation_rate": self.escalated / self.cases if self.cases else 0.0,
+                "reasons": dict(self.reasons),
+                "classifier_ms_per_case": self.classifier_ms / self.cases if self.cases else 0.0,
+                "llm_ms_per_escalation": self.llm_ms / self.escalated if self.escalated else 0.0,
+                "llm_share_of_latency": self.llm_ms / total_ms if total_ms else 0.0
+            }
+
+_stats = CascadeStats()
+
+def cascade_stats():
+    """Escalation rate and latency split since the process started"""
+    return _stats.summary()
+
+def escalation_reason(analysis, threshold):
+    """Why the classifier result needs the LLM, or None if it can be returned as is"""
+    if "error" in analysis:
+        return "classifier_error"
+    if analysis["debug"]["is_override"]:
+        return "override"
+    if analysis["confidence"] < threshold:
+        return "low_confidence"
+    return None
+
+def build_llm_prompt(case_text, top_probs):
+    """Case description followed by the classifier's top sections as hints"""
+    prompt = extract_case_description(case_text)
+    if top_probs:
+        hints = ", ".join(f"Section {section} ({prob:.1f}%)" for section, prob in top_probs)
+        prompt += ("\n\nA text classifier suggested these IPC sections (it may be wrong, "
+                   f"verify against the facts): {hints}")
+    return prompt
+
+def ask_llm(prompt, fields=None):
+    """Run the prompt through the pinggg-legal model; returns (analysis dict, raw text, error)"""
+    if LLM_DIR not in sys.path:
+        sys.path.insert(0, LLM_DIR)
+    import legal_analyzer
+    from response_parser import parse_response
+
+    if fields:
+        extracted = legal_analyzer.analyze_case_fields(prompt, fields)
+        return extracted["analysis"], None, extracted["error"]
+    response = legal_analyzer.analyze_case(prompt)
+    if response.startswith("Error"):
+        return None, response, response
+    return parse_response(response).to_dict(), response, None
+
+def cascade_analyze(case_text, threshold=DEFAULT_THRESHOLD, llm_fields=None):
+    """Classify with the RandomForest and escalate to the LLM only when it is unsure
+
+    The classifier answer is returned as is when its confidence is at least
+    threshold percent and no override rule fired. Otherwise the case goes to
+    the pinggg-legal model with the classifier's top sections as hints.
+    llm_fields (e.g. ["section", "confidence"]) stops the LLM once those
+    fields are known. If the LLM fails, the classifier answer is kept.
+    """
+    start = time.perf_counter()
+    analysis = analyze_case(case_text)
+    classifier_ms = (time.perf_counter() - start) * 1000
+
+    reason = escalation_reason(analysis, threshold)
+    result = {
+        "predicted_section": analysis.get("predicted_section"),
+        "confidence": analysis.get("confidence"),
+        "source": "classifier",
+        "escalated": reason is not None,
+        "reason": reason,
+        "classifier": analysis,
+        "llm": None,
+        "timing": {"classifier_ms": classifier_ms, "llm_ms": 0.0, "total_ms": classifier_ms}
+    }
+
+    if reason is not None:
+        top_probs = analysis.get("debug", {}).get("top_probs", [])
+        llm_start = time.perf_counter()
+        llm_analysis, response, error = ask_llm(build_llm_prompt(case_text, top_probs), llm_fields)
+        result["timing"]["llm_ms"] = (time.perf_counter() - llm_start) * 1000
+        result["llm"] = {"analysis": llm_analysis, "response": response, "error": error}
+        if llm_analysis and llm_analysis.get("section"):
+            result["predicted_section"] = llm_analysis["section"]
+            result["confidence"] = llm_analysis.get("confidence")
+            result["source"] = "llm"
+
+    result["timing"]["total_ms"] = (time.perf_counter() - start) * 1000
+    _stats.record(result)
+    return result
+
+def run_file(path, threshold=DEFAULT_THRESHOLD, llm_fields=None):
+    """Cascade every case in a text file (one per line) and print the escalation summary"""
+    with open(path, "r", encoding="utf-8") as f:
+        cases = [line.strip() for line in f if line.strip()]
+    for case_text in cases:
+        result = cascade_analyze(case_text, threshold=threshold, llm_fields=llm_fields)
+        print(f"{result['source']:>10}  Section {result['predicted_section']}  "
+              f"{result['timing']['total_ms']:8.1f} ms  {case_text[:60]}")
+
+    stats = cascade_stats()
+    print(f"\nCases: {stats['cases']}")
+    print(f"Escalated to LLM: {stats['escalated']} ({stats['escalation_rate']:.1%}) {stats['reasons']}")
+    print(f"Classifier: {stats['classifier_ms_per_case']:.1f} ms per case")
+    print(f"LLM: {stats['llm_ms_per_escalation']:.0f} ms per escalation "
+          f"({stats['llm_share_of_latency']:.1%} of total latency)")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="RandomForest first, pinggg-legal LLM only when the classifier is unsure")
+    parser.add_argument("case_text", nargs="*", help="Case description")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Confidence (percent) needed to skip the LLM")
+    parser.add_argument("--fields", type=str, help="Comma-separated LLM fields to wait for, e.g. section,confidence")
+    parser.add_argument("--file", type=str, help="Text file with one case per line; prints the escalation rate")
+    args = parser.parse_args()
+
+    llm_fields = [field.strip() for field in args.fields.split(",")] if args.fields else None
+    if args.file:
+        run_file(args.file, threshold=args.threshold, llm_fields=llm_fields)
+    elif args.case_text:
+        print(json.dumps(cascade_analyze(' '.join(args.case_text), threshold=args.threshold,
+                                         llm_fields=llm_fields), indent=2))
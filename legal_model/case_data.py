@@ -0,0 +1,225 @@
+import csv
+import glob
+import json
+import mmap
+import os
+import re
+import sys
+
+# Text fields in the scraped case data that carry judgment text
+CASE_TEXT_FIELDS = ["summary", "full_text"]
+TRAINING_TEXT_FIELDS = ["text"]
+
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+
+# Tokens that matter when scanning a JSON array for record boundaries
+JSON_STRUCTURE = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+
+def find_data_dir():
+    """Locate the scraped case data directory shipped with the pinggg model"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    possible_paths = [
+        os.path.join(current_dir, "data"),
+        os.path.join(os.path.dirname(current_dir), "pinggg-legal-model", "final_export", "final_export", "data"),
+    ]
+
+    for path in possible_paths:
+        if os.path.isdir(path):
+            return path
+
+    raise FileNotFoundError("Could not find the case data directory in any of the expected locations")
+
+def list_case_files(pattern="all_cases_*.json", data_dir=None):
+    """List case data files matching a glob pattern, oldest scrape first"""
+    if data_dir is None:
+        data_dir = find_data_dir()
+    return sorted(glob.glob(os.path.join(data_dir, pattern)))
+
+def text_fields_for(path):
+    """Return the names of the judgment text fields for a data file"""
+    if os.path.basename(path).startswith("training_data_"):
+        return TRAINING_TEXT_FIELDS
+    return CASE_TEXT_FIELDS
+
+def iter_records(path):
+    """Yield the records of a case data file one at a time (.json, .jsonl or .csv)"""
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        for record in records:
+            yield record
+    elif path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for record in csv.DictReader(f):
+                yield record
+    else:
+        raise ValueError(f"Unsupported case data file: {path}")
+
+def iter_corpus(paths):
+    """Yield (path, record) pairs across several case data files"""
+    for path in paths:
+        for record in iter_records(path):
+            yield path, record
+
+def scan_json_array(data):
+    """Return the (start, end) byte offsets of each top-level object in a JSON array"""
+    offsets = []
+    depth = 0
+    start = None
+    for match in JSON_STRUCTURE.finditer(data):
+        token = match.group()
+        if token[0] == 0x22:  # string literal, skip over it
+            continue
+        if token in (b"{", b"["):
+            depth += 1
+            if depth == 2 and token == b"{":
+                start = match.start()
+        else:
+            if depth == 2 and token == b"}":
+                offsets.append((start, match.end()))
+            depth -= 1
+    return offsets
+
+def scan_json_lines(data):
+    """Return the (start, end) byte offsets of each non-empty line"""
+    offsets = []
+    pos = 0
+    size = len(data)
+    while pos < size:
+        end = data.find(b"\n", pos)
+        if end == -1:
+            end = size
+        if data[pos:end].strip():
+            offsets.append((pos, end))
+        pos = end + 1
+    return offsets
+
+def build_offset_index(path):
+    """Scan a .json or .jsonl case file once and record each record's byte offsets and doc_id"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if path.endswith(".jsonl"):
+            offsets = scan_json_lines(data)
+        else:
+            offsets = scan_json_array(data)
+        doc_ids = [json.loads(data[start:end]).get("doc_id") for start, end in offsets]
+
+    stat = os.stat(path)
+    index = {
+        "version": INDEX_VERSION,
+        "source_size": stat.st_size,
+        "source_mtime": stat.st_mtime,
+        "offsets": [list(pair) for pair in offsets],
+        "doc_ids": doc_ids,
+    }
+    with open(path + INDEX_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    return index
+
+def load_offset_index(path):
+    """Load the offset index for a case file, rebuilding it if missing or stale"""
+    index_path = path + INDEX_SUFFIX
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        stat = os.stat(path)
+        if (index.get("version") == INDEX_VERSION and index["source_size"] == stat.st_size
+                and index["source_mtime"] == stat.st_mtime):
+            return index
+    return build_offset_index(path)
+
+class CaseFile:
+    """Random access to the records of a case file without parsing the whole file
+
+    The file is memory-mapped and only the requested records are decoded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        index = load_offset_index(path)
+        self.offsets = index["offsets"]
+        self.positions = {}
+        for pos, doc_id in enumerate(index["doc_ids"]):
+            self.positions.setdefault(doc_id, pos)
+        self._file = open(path, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, pos):
+        start, end = self.offsets[pos]
+        return json.loads(self._data[start:end])
+
+    def __contains__(self, doc_id):
+        return doc_id in self.positions
+
+    def get(self, doc_id, default=None):
+        """Decode the record with the given doc_id"""
+        pos = self.positions.get(doc_id)
+        if pos is None:
+            return default
+        return self[pos]
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def find_case(doc_id, paths=None):
+    """Look up a judgment by doc_id across the case files using their offset indexes"""
+    if paths is None:
+        paths = list_case_files("*.json") + list_case_files("*.jsonl")
+    for path in paths:
+        with CaseFile(path) as case_file:
+            record = case_file.get(doc_id)
+        if record is not None:
+            return record
+    return None
+
+def write_json_lines(records, path):
+    """Write records as JSON Lines, one judgment per line"""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index and convert scraped case data files")
+    parser.add_argument("inputs", nargs="*", help="Case JSON files (defaults to the bundled data)")
+    parser.add_argument("--jsonl", action="store_true", help="Also write a .jsonl copy of each file")
+    parser.add_argument("--get", type=str, help="Print the judgment with this doc_id")
+    args = parser.parse_args()
+
+    paths = args.inputs or list_case_files("*.json")
+
+    if args.get:
+        record = find_case(args.get, paths)
+        if record is None:
+            print(f"No case with doc_id {args.get}")
+            sys.exit(1)
+        print(json.dumps(record, indent=2, ensure_ascii=False))
+    else:
+        for path in paths:
+            index = build_offset_index(path)
+            print(f"Indexed {len(index['offsets'])} records in {os.path.basename(path)}")
+            if args.jsonl and path.endswith(".json"):
+                jsonl_path = path[:-len(".json")] + ".jsonl"
+                write_json_lines(iter_records(path), jsonl_path)
+                build_offset_index(jsonl_path)
+                print(f"Wrote {jsonl_path}")
@@ -0,0 +1,118 @@
+import re
+import sys
+
+from text_normalizer import get_normalizer
+
+# Header labels sent by the web routes, mapped to record fields.
+# predict-ipc: Crime Type / Location / Date / Evidence / Case Description
+# generate-fir: Crime Type / Incident Description / Location / Date and Time / Suspect Details / Witness Information
+HEADER_LABELS = {
+    "crime type": "crime_type",
+    "location": "location",
+    "date and time": "date",
+    "date": "date",
+    "evidence": "evidence",
+    "case description": "description",
+    "incident description": "description",
+    "suspect details": "suspects",
+    "witness information": "witnesses",
+}
+
+LABEL_ALTERNATION = "|".join(sorted((re.escape(label) for label in HEADER_LABELS), key=len, reverse=True))
+
+# A label starts a line, so "The evidence: a broken bottle" inside a description is not a label
+HEADER_PATTERN = re.compile(
+    r"^[ \t]*(" + LABEL_ALTERNATION + r")[ \t]*:[ \t]*",
+    re.IGNORECASE | re.MULTILINE
+)
+# Blocks flattened to one line without a line-initial label: a label may follow any whitespace
+FLAT_HEADER_PATTERN = re.compile(
+    r"(?:^|(?<=\s))(" + LABEL_ALTERNATION + r")[ \t]*:[ \t]*",
+    re.IGNORECASE
+)
+
+class CaseHeader:
+    """Fields of a formatted case block plus the lowercased and normalized views used downstream"""
+
+    def __init__(self, raw, fields=None):
+        fields = fields or {}
+        self.raw = raw
+        self.crime_type = fields.get("crime_type", "")
+        self.location = fields.get("location", "")
+        self.date = fields.get("date", "")
+        self.evidence = [item.strip() for item in fields.get("evidence", "").split(",") if item.strip()]
+        self.suspects = fields.get("suspects", "")
+        self.witnesses = fields.get("witnesses", "")
+        # Plain text without a header is all description
+        self.description = fields.get("description", "") if fields else raw.strip()
+        if not self.description and fields:
+            self.description = raw.strip()
+
+        if "description" not in fields:
+            self.variant = "plain" if not fields else "partial"
+        elif "suspects" in fields or "witnesses" in fields:
+            self.variant = "fir"
+        else:
+            self.variant = "predict"
+
+        self.crime_type_lower = self.crime_type.lower()
+        self.description_lower = self.description.lower()
+        self._normalized = {}
+
+    def normalized_with(self, normalizer):
+        """The description under the given TextNormalizer, computed once per version"""
+        if normalizer.name not in self._normalized:
+            self._normalized[normalizer.name] = normalizer(self.description)
+        return self._normalized[normalizer.name]
+
+    @property
+    def normalized(self):
+        """The description in the default classifier input form"""
+        return self.normalized_with(get_normalizer())
+
+    def to_dict(self):
+        return {
+            "variant": self.variant,
+            "crime_type": self.crime_type,
+            "location": self.location,
+            "date": self.date,
+            "evidence": self.evidence,
+            "description": self.description,
+            "suspects": self.suspects,
+            "witnesses": self.witnesses,
+        }
+
+def parse_case_header(text):
+    """Split a formatted case block into a CaseHeader in one pass over its labels
+
+    Labels must start a line; only when no line does is the text treated as a
+    flattened block where labels may follow any whitespace. Only the first
+    occurrence of each label counts, and everything after "Case Description:"
+    belongs to the description, so free text that happens to contain
+    "Location:" or "Date:" is not split.
+    """
+    pattern = HEADER_PATTERN if HEADER_PATTERN.search(text) else FLAT_HEADER_PATTERN
+    matches = []
+    found = set()
+    for match in pattern.finditer(text):
+        label = match.group(1).lower()
+        field = HEADER_LABELS[label]
+        if field in found:
+            continue
+        found.add(field)
+        matches.append((field, match.start(), match.end()))
+        if label == "case description":
+            break
+
+    fields = {}
+
+    for i, (field, _, value_start) in enumerate(matches):
+        value_end = matches[i + 1][1] if i + 1 < len(matches) else len(text)
+        fields[field] = text[value_start:value_end].strip()
+    return CaseHeader(text, fields)
+
+if __name__ == "__main__":
+    import json
+
+    if len(sys.argv) > 1:
+        print(json.dumps(parse_case_header(' '.join(sys.argv[1:])).to_dict(), indent=2))
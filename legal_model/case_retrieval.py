@@ -0,0 +1,223 @@
+import json
+import math
+import os
+import re
+import sys
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from case_data import list_case_files, iter_corpus
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+DEFAULT_TOP_K = 5
+DEFAULT_MAX_CANDIDATES = 50
+DEFAULT_LEXICAL_WEIGHT = 0.6
+DEFAULT_CLASSIFIER_WEIGHT = 0.4
+
+WORD_PATTERN = re.compile(r"[a-z]{2,}")
+SECTION_PATTERN = re.compile(r"(\d+[A-Za-z]?)(?:IPC|CrPC|Cr|etc)?")
+LEADING_DIGITS = re.compile(r"\d+")
+
+def normalize_section(section):
+    """Normalize a scraped IPC section label ('302IPC', '166ACr', '307etc') to its number"""
+    section = section.strip()
+    match = SECTION_PATTERN.fullmatch(section)
+    if match:
+        return match.group(1).upper()
+    match = LEADING_DIGITS.match(section)
+    return match.group() if match else None
+
+def normalize_sections(sections):
+    """Normalize and deduplicate a list of section labels, keeping order"""
+    normalized = []
+    seen = set()
+    for section in sections or []:
+        value = normalize_section(section)
+        if value and value not in seen:
+            seen.add(value)
+            normalized.append(value)
+    return normalized
+
+def tokenize(text):
+    """Lowercase word tokens without English stop words"""
+    return [w for w in WORD_PATTERN.findall(text.lower()) if w not in ENGLISH_STOP_WORDS]
+
+class CaseIndex:
+    """BM25 inverted index over the scraped judgments with a section -> documents map"""
+
+    def __init__(self, records, mask=None):
+        self.docs = []
+        postings = {}
+        doc_lengths = []
+
+        for record in records:
+            text = " ".join(record.get(field) or "" for field in ("title", "summary", "full_text"))
+            if mask is not None:
+                from boilerplate import strip_text
+                text, _ = strip_text(text, mask)
+            tokens = tokenize(text)
+
+            doc_idx = len(self.docs)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, ([], []))
+                postings[token][0].append(doc_idx)
+                postings[token][1].append(count)
+            doc_lengths.append(len(tokens))
+
+            self.docs.append({
+                "doc_id": record.get("doc_id"),
+                "title": record.get("title"),
+                "court": record.get("court"),
+                "date": record.get("date"),
+                "url": record.get("url"),
+                "ipc_sections": normalize_sections(record.get("ipc_sections")),
+            })
+
+        self.num_docs = len(self.docs)
+        self.doc_lengths = np.array(doc_lengths, dtype=np.float32)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if self.num_docs else 0.0
+        self.postings = {
+            token: (np.array(idx, dtype=np.int32), np.array(tf, dtype=np.float32))
+            for token, (idx, tf) in postings.items()
+        }
+
+        section_docs = {}
+        for doc_idx, doc in enumerate(self.docs):
+            for section in doc["ipc_sections"]:
+                section_docs.setdefault(section, []).append(doc_idx)
+        self.section_docs = {s: np.array(idx, dtype=np.int32) for s, idx in section_docs.items()}
+
+    @classmethod
+    def from_files(cls, paths=None, mask=None):
+        """Build an index from case JSON files, skipping judgments already seen under another query"""
+        if paths is None:
+            paths = list_case_files("*.json")
+        seen = set()
+        records = []
+        for _, record in iter_corpus(paths):
+            doc_id = record.get("doc_id")
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            records.append(record)
+        return cls(records, mask=mask)
+
+    def lexical_scores(self, query):
+        """BM25 score of every document for the query"""
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for token in set(tokenize(query)):
+            if token not in self.postings:
+                continue
+            doc_idx, tf = self.postings[token]
+            df = len(doc_idx)
+            idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_idx] / self.avg_doc_length)
+            scores[doc_idx] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def section_boosts(self, section_weights):
+        """Per-document boost: sum of weights of predicted sections the document cites"""
+        boosts = np.zeros(self.num_docs, dtype=np.float32)
+        for section, weight in section_weights.items():
+            doc_idx = self.section_docs.get(section)
+            if doc_idx is not None:
+                boosts[doc_idx] += weight
+        return boosts
+
+_index = None
+
+def get_index():
+    """Build the corpus index once per process"""
+    global _index
+    if _index is None:
+        mask = None
+        mask_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "boilerplate_mask.bin")
+        if os.path.exists(mask_path):
+            from boilerplate import BoilerplateMask
+            mask = BoilerplateMask.load(mask_path)
+        _index = CaseIndex.from_files(mask=mask)
+    return _index
+
+def section_weights_from_analysis(analysis):
+    """Turn the classifier's top probabilities (and any override) into section weights"""
+    weights = {}
+    debug = analysis.get("debug", {})
+    for section, prob in debug.get("top_probs", []):
+        weights[str(section)] = prob / 100.0
+
+    final_section = analysis.get("predicted_section")
+    if final_section and debug.get("is_override"):
+        weights[final_section] = max(weights.get(final_section, 0.0), analysis.get("confidence", 0.0) / 100.0)
+    return weights
+
+def rank_similar_cases(query, analysis, top_k=DEFAULT_TOP_K, max_candidates=DEFAULT_MAX_CANDIDATES,
+                       lexical_weight=DEFAULT_LEXICAL_WEIGHT, classifier_weight=DEFAULT_CLASSIFIER_WEIGHT,
+                       index=None):
+    """Rank precedents by BM25 relevance reranked with the classifier's section probabilities"""
+    timing = {}
+
+    start = time.perf_counter()
+    if index is None:
+        index = get_index()
+    timing["index_ms"] = (time.perf_counter() - start) * 1000
+
+    # Candidate generation: cap the lexical matches before reranking
+    start = time.perf_counter()
+    scores = index.lexical_scores(query)
+    candidates = np.flatnonzero(scores)
+    if len(candidates) > max_candidates:
+        top = np.argpartition(scores[candidates], -max_candidates)[-max_candidates:]
+        candidates = candidates[top]
+    timing["retrieve_ms"] = (time.perf_counter() - start) * 1000
+
+    # Rerank the candidate set in one vectorized pass
+    start = time.perf_counter()
+    section_weights = section_weights_from_analysis(analysis)
+    lexical = scores[candidates]
+    if len(lexical) and lexical.max() > 0:
+        lexical = lexical / lexical.max()
+    boosts = index.section_boosts(section_weights)[candidates]
+    combined = lexical_weight * lexical + classifier_weight * boosts
+    order = np.argsort(-combined, kind="stable")[:top_k]
+    timing["rerank_ms"] = (time.perf_counter() - start) * 1000
+
+    similar_cases = []
+    for pos in order:
+        doc = index.docs[candidates[pos]]
+        similar_cases.append({
+            **doc,
+            "matched_sections": [s for s in doc["ipc_sections"] if s in section_weights],
+            "lexical_score": float(lexical[pos]),
+            "classifier_boost": float(boosts[pos]),
+            "score": float(combined[pos]),
+        })
+
+    return {"similar_cases": similar_cases, "timing": timing}
+
+def analyze_with_similar_cases(case_text, top_k=DEFAULT_TOP_K, **kwargs):
+    """Run analyze_case and attach the reranked similar cases to its result"""
+    from direct_analyze import analyze_case, extract_case_description
+
+    start = time.perf_counter()
+    analysis = analyze_case(case_text)
+    classify_ms = (time.perf_counter() - start) * 1000
+    if "error" in analysis:
+        return analysis
+
+    ranking = rank_similar_cases(extract_case_description(case_text), analysis, top_k=top_k, **kwargs)
+    analysis["similar_cases"] = ranking["similar_cases"]
+    analysis["timing"] = {"classify_ms": classify_ms, **ranking["timing"]}
+    return analysis
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        case_text = ' '.join(sys.argv[1:])
+        print(json.dumps(analyze_with_similar_cases(case_text), indent=2))
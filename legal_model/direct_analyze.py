@@ -4,147 +4,217 @@ import re
 import pickle
 import sys
 import os
+import time
+from functools import partial
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+from party_extractor import extract_parties
+from case_header import parse_case_header
+from text_normalizer import normalize_text, normalizer_for_config
+from long_document import classify_long_text
+from fast_tfidf import FastTfidf, is_supported, restore_idf
+from model_bundle import BUNDLE_FILE, find_bundle, load_bundle
+from model_registry import ModelRegistry
+
+# Top-level result fields --omit can leave out
+OMITTABLE_FIELDS = ("case_text", "explanation", "recommendations", "debug", "evidence", "parties")
+
+MODEL_FILES = ["rf_classifier.pkl", "tfidf_vectorizer.pkl", "label_encoder.pkl", "model_config.json"]
+
+# Loaded model components and the last measured RandomForest latency, kept per process
+_model_components = None
+_registry = None
+_rf_latency_ms = None
+
 def preprocess_text(text):
     """Clean and preprocess text"""
-    # Convert to lowercase
-    text = text.lower()
-    # Remove special characters but keep spaces between words
-    text = re.sub(r'[^a-zA-Z\s]', ' ', text)
-    # Remove extra whitespace
-    text = ' '.join(text.split())
-    return text
-
-def extract_parties(text):
-    """Extract only the relevant parties (people) from the case text"""
-    parties = []
-    
-    # Find standard Person A/B/C references
-    person_pattern = r'(person\s+[A-Za-z])\b'
-    matches = re.findall(person_pattern, text, re.IGNORECASE)
-    for match in matches:
-        if match.lower() not in [p.lower() for p in parties]:
-            parties.append(match.title())
-    
-    # Find names that look like actual person names (two capitalized words)
-    name_pattern = r'\b([A-Z][a-z]+\s+[A-Z][a-z]+)\b'
-    matches = re.findall(name_pattern, text)
-    for match in matches:
-        if match.lower() not in [p.lower() for p in parties]:
-            parties.append(match)
-    
-    # Find references to "the accused", "the victim", etc.
-    role_patterns = [r'\b(the\s+accused)\b', r'\b(the\s+victim)\b', r'\b(the\s+complainant)\b']
-    for pattern in role_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for match in matches:
-            if match.lower() not in [p.lower() for p in parties]:
-                parties.append(match.title())
-    
-    # If no parties found, but case has standard terminology
-    if not parties:
-        if "accused" in text.lower():
-            parties.append("The Accused")
-        if "victim" in text.lower():
-            parties.append("The Victim")
-    
-    return parties
+    return normalize_text(text)
 
 def extract_case_description(text):
     """Extract the actual case description from formatted input"""
-    # Check if text contains the marker "Case Description:"
-    if "Case Description:" in text:
-        # Split by the marker and get the content after it
-        parts = text.split("Case Description:", 1)
-        if len(parts) > 1:
-            return parts[1].strip()
-    
-    # If no marker found or no content after marker, return the original text
-    return text
-
-def analyze_case(case_text):
-    """Analyze a legal case and identify relevant IPC sections with detailed explanation"""
-    try:
-        # First extract the actual case description if it's embedded in formatted text
-        case_description = extract_case_description(case_text)
+    # "Case Description:" (predict-ipc) or "Incident Description:" (generate-fir);
+    # plain text is returned as is
+    return parse_case_header(text).description
+
+def find_model_dir():
+    """The directory of this module, when it holds the RandomForest model files
+    
+    Other models are served through the registry (model_registry.py) or a
+    bundle at LEGAL_MODEL_BUNDLE, never from directories guessed on disk.
+    """
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    missing = [name for name in MODEL_FILES if not os.path.exists(os.path.join(base_path, name))]
+    if missing:
+        raise FileNotFoundError(f"Model files missing from {base_path}: {', '.join(missing)}")
+    return base_path
+
+def load_components_from(base_path):
+    """Load the RandomForest, vectorizer, label encoder and config from one directory
+    
+    A model bundle (see model_bundle.py) in the directory is memory-mapped;
+    otherwise the pickles are loaded.
+    """
+    bundle_path = os.path.join(base_path, BUNDLE_FILE)
+    if os.path.exists(bundle_path):
+        return load_bundle(bundle_path)
+    
+    with open(os.path.join(base_path, "rf_classifier.pkl"), 'rb') as f:
+        clf = pickle.load(f)
+    
+    with open(os.path.join(base_path, "tfidf_vectorizer.pkl"), 'rb') as f:
+        vectorizer = pickle.load(f)
+    # Single cases skip scikit-learn's analyzer machinery; the output matrix is the same
+    vectorizer = FastTfidf.from_vectorizer(vectorizer) if is_supported(vectorizer) else restore_idf(vectorizer)
         
-        # Find the model files in the current directory
-        current_dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(base_path, "label_encoder.pkl"), 'rb') as f:
+        label_encoder = pickle.load(f)
         
-        # Try different paths to find the model files
-        possible_paths = [
-            current_dir,  # Try current directory first
-            os.path.join(current_dir, ".."),  # Try parent directory
-            os.path.join(os.path.dirname(current_dir), "legal_model"),  # Try legal_model directory
-            # Add absolute paths as fallbacks
-            "C:\\Users\\LENOVO\\Downloads\\legelly\\legaltrack4\\legal_model"
-        ]
+    with open(os.path.join(base_path, "model_config.json"), 'r') as f:
+        config = json.load(f)
+    
+    return (clf, vectorizer, label_encoder, config)
+
+def get_registry():
+    """The model registry shared by this process"""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry(loader=load_components_from)
+    return _registry
+
+def active_model_dir():
+    """Directory of the model files in use: the registry's current version, else this module's directory"""
+    registry = get_registry()
+    version = registry.current_version()
+    return registry.version_path(version) if version is not None else find_model_dir()
+
+def load_active_model():
+    """(components, version) for the next request
+    
+    The registry's current version wins when one is activated, so a retrained
+    model can be swapped in without restarting. Otherwise the bundle
+    (LEGAL_MODEL_BUNDLE or next to this module) or the pickles next to this
+    module are loaded once per process and version is None.
+    """
+    global _model_components
+    loaded = get_registry().get()
+    if loaded is not None:
+        return loaded.components, loaded.version
+    if _model_components is None and find_bundle():
+        _model_components = load_bundle(find_bundle())
+    if _model_components is None:
+        _model_components = load_components_from(find_model_dir())
+    return _model_components, None
+
+def load_model_components():
+    """Load the RandomForest, vectorizer, label encoder and config"""
+    return load_active_model()[0]
+
+def predict_with_keywords(case_description):
+    """Zero-model fast path: score sections with the keyword matcher compiled from ipc_sec_dataset.csv
+    
+    Returns an empty list when no keyword matches.
+    """
+    from keyword_classifier import predict_keywords, SECTION_ALIASES
+    
+    return [(SECTION_ALIASES.get(section, section), prob) for section, prob in predict_keywords(case_description)]
+
+def analyze_case(case_text, latency_budget_ms=None, aggregation=None):
+    """Analyze a legal case and identify relevant IPC sections with detailed explanation
+    
+    Falls back to the keyword matcher when the model files are missing, or when
+    a latency budget is given and the last measured RandomForest latency does
+    not fit it. The first budgeted call loads and times the RandomForest, and
+    cases no keyword matches always go to the RandomForest when it exists.
+    
+    aggregation ("max", "mean" or "attention") turns on long-document mode: the
+    description is split into overlapping windows that the RandomForest scores
+    in one batch, and the result gets per-window "evidence" spans.
+    """
+    global _rf_latency_ms
+    try:
+        # Parse the formatted header once; later steps reuse its fields and views
+        header = parse_case_header(case_text)
+        case_description = header.description
         
-        model_files_found = False
-        clf = None
-        vectorizer = None
-        label_encoder = None
-        config = None
+        # Until the RandomForest has been timed once the budget cannot rule it out
+        use_keywords = (
+            latency_budget_ms is not None and _rf_latency_ms is not None and _rf_latency_ms > latency_budget_ms
+        )
         
-        # Try each path
-        for base_path in possible_paths:
+        components = None
+        model_version = None
+        evidence = None
+        keyword_probs = predict_with_keywords(case_description) if use_keywords else None
+        if not keyword_probs:
             try:
-                # Check if model files exist in this path
-                rf_path = os.path.join(base_path, "rf_classifier.pkl")
-                tfidf_path = os.path.join(base_path, "tfidf_vectorizer.pkl")
-                label_path = os.path.join(base_path, "label_encoder.pkl")
-                config_path = os.path.join(base_path, "model_config.json")
-                
-                if (os.path.exists(rf_path) and os.path.exists(tfidf_path) and 
-                    os.path.exists(label_path) and os.path.exists(config_path)):
-                    # Found all files, load them
-                    with open(rf_path, 'rb') as f:
-                        clf = pickle.load(f)
-                    
-                    with open(tfidf_path, 'rb') as f:
-                        vectorizer = pickle.load(f)
-                        
-                    with open(label_path, 'rb') as f:
-                        label_encoder = pickle.load(f)
-                        
-                    with open(config_path, 'r') as f:
-                        config = json.load(f)
-                    
-                    model_files_found = True
-                    break
-            except Exception as e:
-                continue
-        
-        if not model_files_found:
-            raise FileNotFoundError("Could not find model files in any of the expected locations")
-        
-        # Preprocess the case text
-        processed_text = preprocess_text(case_description)
-        
-        # Vectorize the text
-        text_vector = vectorizer.transform([processed_text])
+                # Fetched once, so a model swap never happens in the middle of a request
+                components, model_version = load_active_model()
+            except FileNotFoundError:
+                components = None
         
-        # Get prediction (class index) and probabilities
-        prediction_idx = clf.predict(text_vector)[0]
-        probabilities = clf.predict_proba(text_vector)[0]
-        
-        # Get the IPC section from the prediction index
-        section = label_encoder.inverse_transform([prediction_idx])[0]
+        if components is None:
+            # Keyword fast path: probabilities come from the matcher, best section first
+            top_probs = keyword_probs if keyword_probs is not None else predict_with_keywords(case_description)
+            if not top_probs:
+                raise ValueError("No IPC keywords matched the case and the RandomForest model is unavailable")
+            prediction_idx = -1
+            section = top_probs[0][0]
+            original_section = section
+            confidence = top_probs[0][1] * 100
+            top_probs = [(label, prob * 100) for label, prob in top_probs]
+            model_name = "keyword"
+        else:
+            start = time.perf_counter()
+            clf, vectorizer, label_encoder, config = components
+            # Apply the same text transform the model was trained with
+            normalize = normalizer_for_config(config)
+            
+            if aggregation:
+                # Long-document mode: all windows go through the vectorizer and forest together
+                probabilities, evidence = classify_long_text(
+                    case_description,
+                    lambda windows: clf.predict_proba(vectorizer.transform([normalize(w) for w in windows])),
+                    rule=aggregation,
+                    labels=label_encoder.classes_
+                )
+                prediction_idx = int(np.argmax(probabilities))
+            else:
+                # Vectorize the preprocessed case text
+                text_vector = vectorizer.transform([header.normalized_with(normalize)])
+            
+                # Get prediction (class index) and probabilities
+                prediction_idx = clf.predict(text_vector)[0]
+                probabilities = clf.predict_proba(text_vector)[0]
         
-        # Find confidence for the predicted class
-        confidence = probabilities[prediction_idx] * 100
+            # Get the IPC section from the prediction index
+            section = label_encoder.inverse_transform([prediction_idx])[0]
         
-        # Extract crime type from full text if available
-        crime_type = ""
-        if "Crime Type:" in case_text:
-            crime_type_match = re.search(r"Crime Type: *(.*?)(?:\n| Location:)", case_text)
-            if crime_type_match:
-                crime_type = crime_type_match.group(1).strip()
+            # Find confidence for the predicted class
+            confidence = probabilities[prediction_idx] * 100
+            
+            # Get top 3 probabilities
+            top_indices = np.argsort(probabilities)[::-1][:3]
+            top_probs = []
+            for idx in top_indices:
+                prob = probabilities[idx] * 100
+                section_label = label_encoder.inverse_transform([idx])[0]
+                top_probs.append((section_label, prob))
+            
+            original_section = section
+            model_name = "RandomForest"
+            if not aggregation:
+                # The latency budget is compared against single-row calls only
+                _rf_latency_ms = (time.perf_counter() - start) * 1000
         
         # Special case handling for specific scenarios
-        case_text_lower = case_description.lower()
-        crime_type_lower = crime_type.lower() if crime_type else ""
+        case_text_lower = header.description_lower
+        crime_type_lower = header.crime_type_lower
         override_section = None
         
         # Handle self-defense case (crucial for your specific requirement)
@@ -172,19 +242,18 @@ def analyze_case(case_text):
         
         # Debug information
         debug_info = {
+            'model': model_name,
             'prediction_idx': int(prediction_idx),
-            'original_section': label_encoder.inverse_transform([prediction_idx])[0],
+            'original_section': original_section,
             'final_section': section,
             'is_override': override_section is not None,
-            'top_probs': []
+            'top_probs': top_probs
         }
-        
-        # Get top 3 probabilities
-        top_indices = np.argsort(probabilities)[::-1][:3]
-        for idx in top_indices:
-            prob = probabilities[idx] * 100
-            section_label = label_encoder.inverse_transform([idx])[0]
-            debug_info['top_probs'].append((section_label, prob))
+        if model_version is not None:
+            debug_info['model_version'] = model_version
+        if evidence is not None:
+            debug_info['aggregation'] = aggregation
+            debug_info['windows'] = len(evidence)
         
         # Extract parties involved
         parties = extract_parties(case_description)
@@ -208,6 +277,8 @@ def analyze_case(case_text):
             "recommendations": recommendations,
             "debug": debug_info
         }
+        if evidence is not None:
+            result["evidence"] = evidence
         
         return result
     except Exception as e:
@@ -361,56 +432,119 @@ def get_recommendations(confidence):
 - Consider gathering more case details and evidence
 - Complex case may involve multiple legal provisions"""
 
-def display_result(result):
+def display_result(result, file=None):
     """Display the analysis result in console format similar to analyze_case.py"""
-    print("\nLegal Case Analysis")
-    print("==================================================")
+    emit = partial(print, file=file or sys.stdout)
+    emit("\nLegal Case Analysis")
+    emit("==================================================")
     
-    print("\nCase Description:")
-    print(result.get("case_text", "N/A"))
+    emit("\nCase Description:")
+    emit(result.get("case_text", "N/A"))
     
     if "error" in result:
-        print("\nError:", result["error"])
-        print("Message:", result["message"])
+        emit("\nError:", result["error"])
+        emit("Message:", result["message"])
         return
     
     # Add debug information
     if "debug" in result:
-        print("\nDebug Information:")
-        print(f"Raw prediction index: {result['debug'].get('prediction_idx')}")
-        print(f"Original section: {result['debug'].get('original_section')}")
+        emit("\nDebug Information:")
+        emit(f"Raw prediction index: {result['debug'].get('prediction_idx')}")
+        emit(f"Original section: {result['debug'].get('original_section')}")
         
         if result['debug'].get('is_override'):
-            print(f"⚠️ Section overridden to: {result['debug'].get('final_section')}")
+            emit(f"⚠️ Section overridden to: {result['debug'].get('final_section')}")
         
-        print(f"Top classes by probability:")
+        emit(f"Top classes by probability:")
         for i, (section, prob) in enumerate(result['debug'].get('top_probs', [])):
-            print(f"  {i+1}. Section {section}: {prob:.1f}%")
+            emit(f"  {i+1}. Section {section}: {prob:.1f}%")
     
-    print("\nLegal Analysis:")
-    print("--------------------------------------------------")
+    emit("\nLegal Analysis:")
+    emit("--------------------------------------------------")
     
     if result.get("parties"):
-        print("\nParties Involved:")
+        emit("\nParties Involved:")
         for party in result["parties"]:
-            print(f"- {party}")
+            emit(f"- {party}")
     
     # Use the final section
-    print(f"\nApplicable IPC Section: {result['predicted_section']} (Confidence: {result['confidence']:.1f}%)")
+    emit(f"\nApplicable IPC Section: {result['predicted_section']} (Confidence: {result['confidence']:.1f}%)")
+    
+    if result.get("evidence"):
+        emit(f"\nStrongest Passages ({len(result['evidence'])} windows, {result['debug'].get('aggregation')}):")
+        for item in result["evidence"][:3]:
+            emit(f"- chars {item['start']}-{item['end']} ({item['score']:.1f}%): {item['text'][:120]}...")
     
-    print("\n" + result["explanation"])
+    emit("\n" + result["explanation"])
     
-    print("\n" + result["recommendations"])
+    emit("\n" + result["recommendations"])
+
+def to_builtin(value):
+    """Plain Python value for NumPy scalars and tuples, for JSON and msgpack"""
+    if isinstance(value, dict):
+        return {key: to_builtin(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_builtin(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def compact_result(result, omit=()):
+    """The result without the omitted top-level fields (e.g. the echoed case_text)"""
+    return {key: value for key, value in result.items() if key not in omit}
+
+def serialize_result(result, output_format="json"):
+    """Encode a result as compact JSON or msgpack bytes"""
+    result = to_builtin(result)
+    if output_format == "msgpack":
+        if not MSGPACK_AVAILABLE:
+            raise RuntimeError("msgpack output needs the msgpack package: pip install msgpack")
+        return msgpack.packb(result, use_bin_type=True)
+    return json.dumps(result, separators=(",", ":")).encode("utf-8")
 
 if __name__ == "__main__":
-    # Get the case text directly from command line arguments
-    if len(sys.argv) > 1:
-        # Skip the first argument (script name) and join all other arguments with spaces
-        case_text = ' '.join(sys.argv[1:])
-        result = analyze_case(case_text)
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Analyze a case with the RandomForest model")
+    parser.add_argument("case_text", nargs="*", help="Case text, or the path of a file holding it")
+    parser.add_argument("--format", choices=["legacy", "json", "msgpack"], default="legacy",
+                        help="legacy: report then JSON on stdout; json/msgpack: only the result on stdout")
+    parser.add_argument("--report", choices=["stdout", "stderr", "none"],
+                        help="Where the human-readable report goes (default: stdout for legacy, none otherwise)")
+    parser.add_argument("--omit", type=str, default="",
+                        help=f"Comma-separated result fields to leave out: {', '.join(OMITTABLE_FIELDS)}")
+    parser.add_argument("--no-echo", action="store_true", help="Leave the input case_text out of the result")
+    parser.add_argument("--aggregate", choices=["max", "mean", "attention"], help="Long-document mode")
+    args = parser.parse_args()
+    if args.format == "msgpack" and not MSGPACK_AVAILABLE:
+        parser.error("--format msgpack needs the msgpack package: pip install msgpack")
+    
+    if args.case_text:
+        # Join all arguments with spaces
+        case_text = ' '.join(args.case_text)
+        # The web routes write the formatted case block to a file and pass its path
+        if len(args.case_text) == 1 and os.path.isfile(case_text):
+            with open(case_text, 'r', encoding='utf-8') as f:
+                case_text = f.read()
+        
+        omit = {field.strip() for field in args.omit.split(",") if field.strip()}
+        unknown = omit - set(OMITTABLE_FIELDS)
+        if unknown:
+            parser.error(f"Unknown fields for --omit: {', '.join(sorted(unknown))}")
+        if args.no_echo:
+            omit.add("case_text")
+        
+        result = analyze_case(case_text, aggregation=args.aggregate)
         
         # Display the result in console format
-        display_result(result)
+        report = args.report or ("stdout" if args.format == "legacy" else "none")
+        if report != "none":
+            display_result(result, file=sys.stdout if report == "stdout" else sys.stderr)
         
-        # Also print the result as JSON for the API to parse
-        print(json.dumps(result)) 
\ No newline at end of file
+        # Also print the result for the API to parse
+        if args.format == "legacy":
+            print(json.dumps(compact_result(result, omit)))
+        else:
+            sys.stdout.flush()
+            sys.stdout.buffer.write(serialize_result(compact_result(result, omit), args.format))
+            sys.stdout.buffer.flush()
@@ -0,0 +1,213 @@
+import json
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+MEMBERS = ("random_forest", "keras", "transformer")
+DEFAULT_DEADLINE_MS = 250.0
+LABEL_PREFIX = re.compile(r"^(?:ipc|section|sec\.?|s\.)\s*", re.IGNORECASE)
+
+def normalize_label(label):
+    """Shared label space: "IPC 302", "Section 302" and "302" are all "302\""""
+    return LABEL_PREFIX.sub("", str(label).strip()).upper()
+
+def rf_probabilities(text):
+    """Section probabilities from the RandomForest in direct_analyze"""
+    from direct_analyze import extract_case_description, load_active_model
+    from text_normalizer import normalizer_for_config
+
+    (clf, vectorizer, label_encoder, config), _ = load_active_model()
+    normalize = normalizer_for_config(config)
+    probabilities = clf.predict_proba(vectorizer.transform([normalize(extract_case_description(text))]))[0]
+    labels = label_encoder.inverse_transform(clf.classes_)
+    return {normalize_label(label): float(prob) for label, prob in zip(labels, probabilities)}
+
+def keras_probabilities(text):
+    """Section probabilities from the predict_ipc model
+
+    Its classes are JSON lists of per-party sections; a class's probability is
+    split over the distinct sections it names and classes naming none are dropped.
+    """
+    from predict_ipc import load_model_components
+
+    model, vectorizer, label_encoder = load_model_components()
+    predictions = model.predict(vectorizer.transform([text]))[0]
+    sections = {}
+    for class_json, prob in zip(label_encoder.classes_, predictions):
+        named = {normalize_label(entry["section"]) for entry in json.loads(class_json) if entry["section"]}
+        for section in named:
+            sections[section] = sections.get(section, 0.0) + float(prob) / len(named)
+    total = sum(sections.values())
+    return {section: prob / total for section, prob in sections.items()} if total else {}
+
+def transformer_probabilities(text):
+    """Section probabilities from the fine-tuned transformer in train_model"""
+    from train_model import predict_section_proba
+
+    return {normalize_label(label): float(prob) for label, prob in predict_section_proba(text)}
+
+MEMBER_FUNCTIONS = {
+    "random_forest": rf_probabilities,
+    "keras": keras_probabilities,
+    "transformer": transformer_probabilities,
+}
+
+def combine(member_probabilities, weights):
+    """Weighted average over the members that answered, in the union of their labels"""
+    total_weight = sum(weights[name] for name in member_probabilities)
+    combined = {}
+    for name, probabilities in member_probabilities.items():
+        for label, prob in probabilities.items():
+            combined[label] = combined.get(label, 0.0) + weights[name] * prob / total_weight
+    return combined
+
+class MemberStats:
+    def __init__(self):
+        self.calls = 0
+        self.contributed = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.skipped_busy = 0
+        self.total_ms = 0.0
+
+class EnsemblePredictor:
+    """Runs the available classifiers in parallel and combines whatever finishes before the deadline
+
+    Members that fail to load in warm_up() are left out. A member that misses
+    the deadline keeps running in its pool thread (Python threads cannot be
+    cancelled); until it finishes that member is skipped as busy, so slow
+    members never pile up work.
+    """
+
+    def __init__(self, members=MEMBERS, weights=None, max_workers=None):
+        unknown = set(members) - set(MEMBER_FUNCTIONS)
+        if unknown:
+            raise ValueError(f"Unknown ensemble members: {', '.join(sorted(unknown))}")
+        self.members = list(members)
+        self.weights = {name: 1.0 for name in self.members}
+        self.weights.update(weights or {})
+        self.unavailable = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or len(self.members),
+                                        thread_name_prefix="ensemble")
+        self._lock = threading.Lock()
+        self._busy = set()
+        self._stats = {name: MemberStats() for name in self.members}
+
+    def warm_up(self, sample="The accused stole a mobile phone from the victim"):
+        """Load every member once so model loading does not count against request deadlines"""
+        for name in list(self.members):
+            try:
+                MEMBER_FUNCTIONS[name](sample)
+            except Exception as e:
+                self.unavailable[name] = f"{type(e).__name__}: {e}"
+                self.members.remove(name)
+        return {"available": list(self.members), "unavailable": dict(self.unavailable)}
+
+    def _run(self, name, text):
+        start = time.perf_counter()
+        try:
+            return MEMBER_FUNCTIONS[name](text), (time.perf_counter() - start) * 1000
+        finally:
+            with self._lock:
+                self._busy.discard(name)
+
+    def predict(self, text, deadline_ms=DEFAULT_DEADLINE_MS):
+        """Combined prediction from the members that answered within deadline_ms"""
+        start = time.perf_counter()
+        futures = {}
+        busy = []
+        with self._lock:
+            for name in self.members:
+                self._stats[name].calls += 1
+                if name in self._busy:
+                    busy.append(name)
+                    self._stats[name].skipped_busy += 1
+                    continue
+                self._busy.add(name)
+                futures[self._pool.submit(self._run, name, text)] = name
+
+        done, not_done = wait(futures, timeout=deadline_ms / 1000)
+
+        member_probabilities = {}
+        members = {}
+        failed = {}
+        for future in done:
+            name = futures[future]
+            try:
+                probabilities, elapsed_ms = future.result()
+            except Exception as e:
+                failed[name] = f"{type(e).__name__}: {e}"
+                continue
+            if not probabilities:
+                failed[name] = "no section probabilities"
+                continue
+            member_probabilities[name] = probabilities
+            best = max(probabilities, key=probabilities.get)
+            members[name] = {"section": best, "confidence": probabilities[best] * 100, "ms": elapsed_ms}
+        timed_out = sorted(futures[future] for future in not_done)
+
+        with self._lock:
+            for name in member_probabilities:
+                self._stats[name].contributed += 1
+                self._stats[name].total_ms += members[name]["ms"]
+            for name in failed:
+                self._stats[name].failed += 1
+            for name in timed_out:
+                self._stats[name].timed_out += 1
+
+        result = {
+            "predicted_section": None,
+            "confidence": None,
+            "top_probs": [],
+            "contributors": sorted(member_probabilities),
+            "timed_out": timed_out,
+            "busy": busy,
+            "failed": failed,
+            "members": members,
+            "deadline_ms": deadline_ms,
+            "elapsed_ms": None
+        }
+        if member_probabilities:
+            combined = combine(member_probabilities, self.weights)
+            ranked = sorted(combined.items(), key=lambda item: item[1], reverse=True)
+            result["predicted_section"] = ranked[0][0]
+            result["confidence"] = ranked[0][1] * 100
+            result["top_probs"] = [(label, prob * 100) for label, prob in ranked[:3]]
+        result["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        return result
+
+    def stats(self):
+        """Per-member contribution counts and mean latency of contributing calls"""
+        with self._lock:
+            return {
+                name: {
+                    "calls": s.calls,
+                    "contributed": s.contributed,
+                    "timed_out": s.timed_out,
+                    "failed": s.failed,
+                    "skipped_busy": s.skipped_busy,
+                    "mean_ms": s.total_ms / s.contributed if s.contributed else None
+                }
+                for name, s in self._stats.items()
+            }
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Deadline-aware ensemble of the RandomForest, Keras and transformer classifiers")
+    parser.add_argument("case_text", nargs="+", help="Case description")
+    parser.add_argument("--deadline-ms", type=float, default=DEFAULT_DEADLINE_MS, help="Time budget per prediction")
+    parser.add_argument("--members", type=str, default=",".join(MEMBERS), help="Comma-separated members to use")
+    args = parser.parse_args()
+
+    ensemble = EnsemblePredictor([name.strip() for name in args.members.split(",")])
+    loaded = ensemble.warm_up()
+    for name, reason in loaded["unavailable"].items():
+        print(f"Skipping {name}: {reason}", file=sys.stderr)
+    print(json.dumps(ensemble.predict(' '.join(args.case_text), deadline_ms=args.deadline_ms), indent=2))
+    ensemble.close()
@@ -0,0 +1,206 @@
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+EXPORT_VERSION = 1
+EXPORT_FILE = "tfidf_fast.json"
+
+def vectorizer_idf(vectorizer):
+    """idf weights of a fitted TfidfVectorizer
+
+    Pickles from scikit-learn before 1.5 keep them only in _tfidf._idf_diag;
+    newer releases read idf_ and silently skip the weighting when it is missing.
+    """
+    tfidf = vectorizer._tfidf
+    idf = getattr(tfidf, "idf_", None)
+    if idf is None and hasattr(tfidf, "_idf_diag"):
+        idf = tfidf._idf_diag.diagonal()
+    return None if idf is None else np.asarray(idf, dtype=np.float64)
+
+def restore_idf(vectorizer):
+    """Give an old pickled TfidfVectorizer back its idf_ so new scikit-learn applies it"""
+    idf = vectorizer_idf(vectorizer)
+    if idf is not None and getattr(vectorizer._tfidf, "idf_", None) is None:
+        vectorizer._tfidf.idf_ = idf
+    return vectorizer
+
+def is_supported(vectorizer):
+    """Whether FastTfidf reproduces this vectorizer (plain word n-grams, no custom callables)"""
+    return (
+        vectorizer.analyzer == "word"
+        and vectorizer.preprocessor is None
+        and vectorizer.tokenizer is None
+        and vectorizer.strip_accents is None
+        and vectorizer.norm in ("l2", None)
+        and not vectorizer.binary
+        and re.compile(vectorizer.token_pattern).groups <= 1
+    )
+
+def export_vectorizer(vectorizer):
+    """Compact JSON-serializable form of a fitted TfidfVectorizer"""
+    if not is_supported(vectorizer):
+        raise ValueError("Only word-analyzer TfidfVectorizers without custom callables can be exported")
+    idf = vectorizer_idf(vectorizer)
+    return {
+        "version": EXPORT_VERSION,
+        "token_pattern": vectorizer.token_pattern,
+        "lowercase": bool(vectorizer.lowercase),
+        "ngram_range": list(vectorizer.ngram_range),
+        "stop_words": sorted(vectorizer.get_stop_words() or []),
+        "norm": vectorizer.norm,
+        "sublinear_tf": bool(vectorizer.sublinear_tf),
+        "vocabulary": {term: int(column) for term, column in vectorizer.vocabulary_.items()},
+        "idf": idf.tolist() if idf is not None and vectorizer.use_idf else None
+    }
+
+class FastTfidf:
+    """TF-IDF transform over an exported vocabulary that builds CSR rows directly
+
+    Produces the same matrix as TfidfVectorizer.transform, with the idf
+    weights the vectorizer was fitted with: counts of the vocabulary n-grams,
+    multiplied by idf, then l2-normalized row by row in column order.
+    """
+
+    def __init__(self, data):
+        if data.get("version") != EXPORT_VERSION:
+            raise ValueError(f"Unsupported TF-IDF export version {data.get('version')}")
+        self.token_pattern = re.compile(data["token_pattern"])
+        self.lowercase = data["lowercase"]
+        self.min_n, self.max_n = data["ngram_range"]
+        self.stop_words = frozenset(data["stop_words"])
+        self.norm = data["norm"]
+        self.sublinear_tf = data["sublinear_tf"]
+        self.vocabulary_ = data["vocabulary"]
+        self.idf = None if data["idf"] is None else np.asarray(data["idf"], dtype=np.float64)
+        self.n_features = len(self.vocabulary_)
+        # Words that occur in some vocabulary n-gram; n-grams with any other word are never looked up
+        self.known_words = frozenset(word for term in self.vocabulary_ for word in term.split(" "))
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer):
+        return cls(export_vectorizer(vectorizer))
+
+    @classmethod
+    def load(cls, path=EXPORT_FILE):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path=EXPORT_FILE):
+        data = {
+            "version": EXPORT_VERSION,
+            "token_pattern": self.token_pattern.pattern,
+            "lowercase": self.lowercase,
+            "ngram_range": [self.min_n, self.max_n],
+            "stop_words": sorted(self.stop_words),
+            "norm": self.norm,
+            "sublinear_tf": self.sublinear_tf,
+            "vocabulary": self.vocabulary_,
+            "idf": None if self.idf is None else self.idf.tolist()
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def count_terms(self, text):
+        """{column: count} for the vocabulary n-grams in text"""
+        if self.lowercase:
+            text = text.lower()
+        tokens = [token for token in self.token_pattern.findall(text) if token not in self.stop_words]
+        known = [token in self.known_words for token in tokens]
+        vocabulary = self.vocabulary_
+        counts = {}
+        for n in range(self.min_n, min(self.max_n, len(tokens)) + 1):
+            for i in range(len(tokens) - n + 1):
+                if not all(known[i:i + n]):
+                    continue
+                column = vocabulary.get(" ".join(tokens[i:i + n]))
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+        return counts
+
+    def transform(self, texts):
+        """CSR matrix with one l2-normalized TF-IDF row per text"""
+        indptr = [0]
+        indices = []
+        values = []
+        for text in texts:
+            counts = self.count_terms(text)
+            columns = sorted(counts)
+            row = np.array([counts[column] for column in columns], dtype=np.float64)
+            if self.sublinear_tf:
+                row = np.log(row) + 1.0
+            if self.idf is not None:
+                row *= self.idf[columns]
+            if self.norm == "l2":
+                # Sequential sum of squares, the same order scikit-learn's normalize() uses
+                total = 0.0
+                for value in row.tolist():
+                    total += value * value
+                if total != 0.0:
+                    row /= np.sqrt(total)
+            indices.extend(columns)
+            values.append(row)
+            indptr.append(len(indices))
+
+        data = np.concatenate(values) if values else np.zeros(0)
+        return csr_matrix(
+            (data, np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int32)),
+            shape=(len(indptr) - 1, self.n_features)
+        )
+
+def benchmark(repeats=5):
+    """Compare FastTfidf with the pickled TfidfVectorizer at batch size 1 and 1000"""
+    import pickle
+    from case_data import list_case_files, iter_corpus
+    from direct_analyze import active_model_dir
+    from keyword_classifier import load_dataset_rows
+    from text_normalizer import normalize_text
+
+    with open(os.path.join(active_model_dir(), "tfidf_vectorizer.pkl"), "rb") as f:
+        vectorizer = restore_idf(pickle.load(f))
+    fast = FastTfidf.from_vectorizer(vectorizer)
+
+    # Short case-like texts: offense descriptions and scraped case summaries
+    texts = [f"{row['Description']}. {row['Keywords']}" for row in load_dataset_rows()]
+    texts += [record["summary"] for _, record in iter_corpus(list_case_files("*.json")) if record.get("summary")]
+    texts = [normalize_text(t) for t in texts]
+    batch = (texts * (1000 // len(texts) + 1))[:1000]
+
+    expected = vectorizer.transform(batch)
+    actual = fast.transform(batch)
+    identical = (
+        np.array_equal(expected.indptr, actual.indptr)
+        and np.array_equal(expected.indices, actual.indices)
+        and np.array_equal(expected.data, actual.data)
+    )
+
+    def best_time(func, inputs, loops):
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(loops):
+                func(inputs)
+            elapsed = (time.perf_counter() - start) / loops
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000
+
+    print(f"Vocabulary: {fast.n_features} n-grams, identical output: {identical}")
+    for size, inputs, loops in ((1, batch[:1], 200), (1000, batch, 1)):
+        sklearn_ms = best_time(vectorizer.transform, inputs, loops)
+        fast_ms = best_time(fast.transform, inputs, loops)
+        print(f"Batch {size:>4}: scikit-learn {sklearn_ms:8.3f} ms  fast {fast_ms:8.3f} ms  "
+              f"({sklearn_ms / fast_ms:.1f}x)")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        benchmark()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--export":
+        import pickle
+
+        with open("tfidf_vectorizer.pkl", "rb") as f:
+            FastTfidf.from_vectorizer(pickle.load(f)).save(EXPORT_FILE)
+        print(f"Wrote {EXPORT_FILE}")
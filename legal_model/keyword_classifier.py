@@ -0,0 +1,206 @@
+import csv
+import os
+import re
+import sys
+import time
+from collections import deque
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+SUFFIXES = ("ing", "ed", "es", "s")
+IRREGULAR_FORMS = {"stole": "steal", "stolen": "steal", "thieves": "thief"}
+
+# Offense names are more specific than the individual keywords
+OFFENSE_WEIGHT = 2.0
+KEYWORD_WEIGHT = 1.0
+
+# The dataset cites definition sections where the classifier predicts the punishment section
+SECTION_ALIASES = {"378": "379"}
+
+def normalize_token(token):
+    """Crude stem of a lowercase token so inflections match ('raped' and 'rape' -> 'rap')"""
+    if token in IRREGULAR_FORMS:
+        return IRREGULAR_FORMS[token]
+    for suffix in SUFFIXES:
+        if len(token) - len(suffix) >= 3 and token.endswith(suffix):
+            token = token[:-len(suffix)]
+            break
+    if len(token) > 3 and token.endswith("e"):
+        token = token[:-1]
+    return token
+
+def normalize_tokens(text):
+    """Normalized token sequence for a text"""
+    return [normalize_token(t) for t in TOKEN_PATTERN.findall(text.lower())]
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over normalized tokens with weighted section outputs
+
+    Every keyword phrase is a path of tokens in the trie. A single pass over the
+    input tokens follows goto/failure links and adds the weights of all phrases
+    ending at each position to the per-section scores.
+    """
+
+    def __init__(self, patterns, sections):
+        self.sections = sections
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+
+        for tokens, section_idx, weight in patterns:
+            state = 0
+            for token in tokens:
+                if token not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                    self.goto[state][token] = len(self.goto) - 1
+                state = self.goto[state][token]
+            self.outputs[state].append((section_idx, weight))
+
+        # Breadth-first pass to set failure links and merge outputs
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(token, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def score(self, text):
+        """Score every section in one pass over the text"""
+        scores = [0.0] * len(self.sections)
+        state = 0
+        for token in normalize_tokens(text):
+            while state and token not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(token, 0)
+            for section_idx, weight in self.outputs[state]:
+                scores[section_idx] += weight
+        return scores
+
+    def predict(self, text, top_n=3):
+        """Return the top sections as (section, probability) pairs, best first
+
+        Probabilities are each section's share of the total keyword weight.
+        An empty list means no keyword matched.
+        """
+        scores = self.score(text)
+        total = sum(scores)
+        if total == 0:
+            return []
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_n]
+        return [(self.sections[i], scores[i] / total) for i in ranked if scores[i] > 0]
+
+def load_dataset_rows(csv_path=None):
+    """Read the offense rows of ipc_sec_dataset.csv"""
+    if csv_path is None:
+        csv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ipc_sec_dataset.csv")
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+def compile_matcher(csv_path=None):
+    """Compile the Keywords column of ipc_sec_dataset.csv into a KeywordMatcher
+
+    A keyword shared by several sections has its weight split between them,
+    and multi-word phrases weigh more than single words.
+    """
+    rows = load_dataset_rows(csv_path)
+
+    sections = []
+    phrase_sections = {}
+    for row in rows:
+        section = row["Section"].replace("IPC", "").strip()
+        if section not in sections:
+            sections.append(section)
+        section_idx = sections.index(section)
+
+        phrases = [(row["Offense"], OFFENSE_WEIGHT)]
+        phrases += [(keyword, KEYWORD_WEIGHT) for keyword in row["Keywords"].split(",")]
+        for phrase, weight in phrases:
+            tokens = tuple(normalize_tokens(phrase))
+            if not tokens:
+                continue
+            entry = phrase_sections.setdefault(tokens, {})
+            entry[section_idx] = max(entry.get(section_idx, 0.0), weight * len(tokens))
+
+    patterns = []
+    for tokens, section_weights in phrase_sections.items():
+        for section_idx, weight in section_weights.items():
+            patterns.append((tokens, section_idx, weight / len(section_weights)))
+
+    return KeywordMatcher(patterns, sections)
+
+_matcher = None
+
+def get_matcher():
+    """Compile the matcher once per process"""
+    global _matcher
+    if _matcher is None:
+        _matcher = compile_matcher()
+    return _matcher
+
+def predict_keywords(text, top_n=3):
+    """Top keyword-matched sections for a case as (section, probability) pairs"""
+    return get_matcher().predict(text, top_n=top_n)
+
+def agreement_texts():
+    """Offense descriptions from ipc_sec_dataset.csv plus distinct judgment summaries from the case files
+
+    Neither needs train_model, whose tensorflow/transformers imports the keyword path must not depend on.
+    """
+    from case_data import list_case_files, iter_corpus
+
+    texts = [row["Description"] for row in load_dataset_rows()]
+    seen = set()
+    for _, record in iter_corpus(list_case_files("*.json")):
+        if record.get("doc_id") in seen or not record.get("summary"):
+            continue
+        seen.add(record.get("doc_id"))
+        texts.append(record["summary"])
+    return texts
+
+def report_agreement(texts=None):
+    """Compare keyword predictions with the RandomForest on offense descriptions and judgment summaries"""
+    from direct_analyze import load_model_components
+    from text_normalizer import normalizer_for_config
+
+    if texts is None:
+        texts = agreement_texts()
+
+    clf, vectorizer, label_encoder, config = load_model_components()
+    normalize = normalizer_for_config(config)
+    rf_sections = label_encoder.inverse_transform(
+        clf.predict(vectorizer.transform([normalize(t) for t in texts]))
+    )
+
+    matcher = get_matcher()
+    agree = 0
+    matched = 0
+    start = time.perf_counter()
+    for text, rf_section in zip(texts, rf_sections):
+        prediction = matcher.predict(text, top_n=1)
+        if not prediction:
+            continue
+        matched += 1
+        section = SECTION_ALIASES.get(prediction[0][0], prediction[0][0])
+        if section == rf_section:
+            agree += 1
+    elapsed_us = (time.perf_counter() - start) * 1e6
+
+    print(f"Cases: {len(texts)}")
+    print(f"Keyword matches: {matched} ({matched / len(texts):.1%})")
+    print(f"Agreement with RandomForest: {agree}/{len(texts)} ({agree / len(texts):.1%})")
+    if matched:
+        print(f"Agreement where a keyword matched: {agree / matched:.1%}")
+    print(f"Keyword scoring: {elapsed_us / len(texts):.1f} us per case")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--agreement":
+        report_agreement()
+    elif len(sys.argv) > 1:
+        case_text = ' '.join(sys.argv[1:])
+        for section, prob in predict_keywords(case_text):
+            print(f"Section {section}: {prob:.1%}")
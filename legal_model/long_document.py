@@ -0,0 +1,109 @@
+import re
+
+import numpy as np
+
+# Windows are counted in words; consecutive windows share OVERLAP words so a
+# sentence cut at one boundary is seen whole by the next window
+WINDOW_WORDS = 150
+OVERLAP_WORDS = 50
+AGGREGATIONS = ("max", "mean", "attention")
+
+WORD_PATTERN = re.compile(r"\S+")
+
+def split_windows(text, window_words=WINDOW_WORDS, overlap_words=OVERLAP_WORDS):
+    """Split text into overlapping word windows; returns [(start_char, end_char, window_text)]
+
+    The number of windows grows linearly with the length of the text. Text
+    that fits in one window comes back as a single window.
+    """
+    if overlap_words >= window_words:
+        raise ValueError("overlap_words must be smaller than window_words")
+    spans = [match.span() for match in WORD_PATTERN.finditer(text)]
+    if not spans:
+        return [(0, len(text), text)]
+
+    stride = window_words - overlap_words
+    windows = []
+    for first in range(0, len(spans), stride):
+        last = min(first + window_words, len(spans)) - 1
+        start, end = spans[first][0], spans[last][1]
+        windows.append((start, end, text[start:end]))
+        if last == len(spans) - 1:
+            break
+    return windows
+
+def aggregate(probabilities, rule="attention"):
+    """Combine per-window class probabilities (windows x classes) into one distribution
+
+    max:       each class keeps its best window score, renormalized to sum to 1
+    mean:      plain average over windows
+    attention: average weighted by each window's top probability, so windows
+               the classifier is sure about count more than boilerplate
+    Returns (probabilities, window_weights).
+    """
+    probabilities = np.asarray(probabilities, dtype=float)
+    n = probabilities.shape[0]
+    if rule == "max":
+        combined = probabilities.max(axis=0)
+        combined = combined / combined.sum()
+        weights = np.full(n, 1.0 / n)
+    elif rule == "mean":
+        weights = np.full(n, 1.0 / n)
+        combined = weights @ probabilities
+    elif rule == "attention":
+        confidence = probabilities.max(axis=1)
+        weights = confidence / confidence.sum()
+        combined = weights @ probabilities
+    else:
+        raise ValueError(f"Unknown aggregation '{rule}', expected one of {', '.join(AGGREGATIONS)}")
+    return combined, weights
+
+def window_evidence(windows, probabilities, weights, class_index, labels=None, snippet_chars=200):
+    """Per-window evidence spans for the chosen class, best supporting window first"""
+    probabilities = np.asarray(probabilities, dtype=float)
+    evidence = []
+    for i, (start, end, window_text) in enumerate(windows):
+        best = int(np.argmax(probabilities[i]))
+        evidence.append({
+            "window": i,
+            "start": start,
+            "end": end,
+            "score": float(probabilities[i][class_index]) * 100,
+            "weight": float(weights[i]),
+            "window_section": labels[best] if labels is not None else best,
+            "text": window_text[:snippet_chars]
+        })
+    evidence.sort(key=lambda item: item["score"], reverse=True)
+    return evidence
+
+def classify_long_text(text, predict_proba, rule="attention", window_words=WINDOW_WORDS,
+                       overlap_words=OVERLAP_WORDS, labels=None):
+    """Classify every window of text in one predict_proba batch and aggregate
+
+    predict_proba takes a list of window texts and returns a windows x classes
+    array. Returns (probabilities, evidence).
+    """
+    windows = split_windows(text, window_words, overlap_words)
+    probabilities = predict_proba([window_text for _, _, window_text in windows])
+    combined, weights = aggregate(probabilities, rule)
+    evidence = window_evidence(windows, probabilities, weights, int(np.argmax(combined)), labels)
+    return combined, evidence
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Classify a long FIR or judgment by overlapping windows")
+    parser.add_argument("path", help="Text file with the case")
+    parser.add_argument("--aggregate", choices=AGGREGATIONS, default="attention", help="How window scores are combined")
+    parser.add_argument("--json", action="store_true", help="Print the full analysis as JSON")
+    args = parser.parse_args()
+
+    from direct_analyze import analyze_case, display_result
+
+    with open(args.path, "r", encoding="utf-8") as f:
+        result = analyze_case(f.read(), aggregation=args.aggregate)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        display_result(result)
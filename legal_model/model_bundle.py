@@ -0,0 +1,266 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from fast_tfidf import FastTfidf, EXPORT_VERSION, export_vectorizer
+
+# One .npy file holding a uint8 blob:
+#   MAGIC | uint32 header length | JSON header | arrays, each aligned to ALIGN bytes
+# The header lists every array's offset, dtype and shape plus the model config,
+# so loading is np.load(mmap_mode='r') and slicing views: no pickle runs and
+# worker processes share the file's pages through the OS page cache.
+MAGIC = b"IPCBNDL\0"
+BUNDLE_VERSION = 1
+ALIGN = 64
+BUNDLE_FILE = "ipc_model.bundle.npy"
+
+def forest_arrays(clf):
+    """Flatten a fitted RandomForestClassifier into node arrays shared by all trees
+
+    Child indices are global, so every tree can be walked at once. Node values
+    are stored as class probabilities, the same normalization the trees apply
+    in predict_proba.
+    """
+    roots, left, right, feature, threshold, value = [], [], [], [], [], []
+    offset = 0
+    for estimator in clf.estimators_:
+        tree = estimator.tree_
+        roots.append(offset)
+        is_leaf = tree.children_left == -1
+        left.append(np.where(is_leaf, -1, tree.children_left + offset))
+        right.append(np.where(is_leaf, -1, tree.children_right + offset))
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        proba = tree.value[:, 0, :clf.n_classes_].astype(np.float64)
+        normalizer = proba.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        value.append(proba / normalizer)
+        offset += tree.node_count
+    return {
+        "forest_roots": np.array(roots, dtype=np.int64),
+        "forest_left": np.concatenate(left).astype(np.int64),
+        "forest_right": np.concatenate(right).astype(np.int64),
+        "forest_feature": np.concatenate(feature).astype(np.int64),
+        "forest_threshold": np.concatenate(threshold).astype(np.float64),
+        "forest_value": np.concatenate(value)
+    }
+
+class ForestPredictor:
+    """predict/predict_proba over the flattened forest arrays of a bundle"""
+
+    def __init__(self, arrays, classes):
+        self.roots = arrays["forest_roots"]
+        self.left = arrays["forest_left"]
+        self.right = arrays["forest_right"]
+        self.feature = arrays["forest_feature"]
+        self.threshold = arrays["forest_threshold"]
+        self.value = arrays["forest_value"]
+        self.classes_ = classes
+
+    def predict_proba(self, X):
+        # Trees compare float32 features against float64 thresholds, like scikit-learn
+        X = np.asarray(X.toarray() if hasattr(X, "toarray") else X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        while True:
+            left = self.left[nodes]
+            active = left != -1
+            if not active.any():
+                break
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(active, np.where(go_left, left, self.right[nodes]), nodes)
+        # Sum tree by tree in estimator order, then average
+        proba = np.zeros((X.shape[0], self.value.shape[1]))
+        for t in range(nodes.shape[1]):
+            proba += self.value[nodes[:, t]]
+        return proba / len(self.roots)
+
+    def predict(self, X):
+        return np.argmax(self.predict_proba(X), axis=1)
+
+class BundleLabelEncoder:
+    """The part of LabelEncoder used at inference"""
+
+    def __init__(self, classes):
+        self.classes_ = classes
+
+    def inverse_transform(self, indices):
+        return self.classes_[np.asarray(indices, dtype=np.int64)]
+
+def write_bundle(path, arrays, header):
+    """Write arrays and a JSON header into one aligned .npy blob"""
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "nbytes": array.nbytes}
+        arrays[name] = array
+
+    # Offsets depend on the header length and the header holds the offsets:
+    # repeat until the header size stops changing
+    header = dict(header, version=BUNDLE_VERSION, arrays=layout)
+    header_bytes = b""
+    while True:
+        data_start = -(-(len(MAGIC) + 4 + len(header_bytes)) // ALIGN) * ALIGN
+        offset = data_start
+        for name in arrays:
+            layout[name]["offset"] = offset
+            offset = -(-(offset + layout[name]["nbytes"]) // ALIGN) * ALIGN
+        encoded = json.dumps(header, sort_keys=True).encode("utf-8")
+        if -(-(len(MAGIC) + 4 + len(encoded)) // ALIGN) * ALIGN == data_start:
+            header_bytes = encoded
+            break
+        header_bytes = encoded
+
+    blob = np.zeros(offset, dtype=np.uint8)
+    prefix = MAGIC + np.uint32(len(header_bytes)).tobytes() + header_bytes
+    blob[:len(prefix)] = np.frombuffer(prefix, dtype=np.uint8)
+    for name, array in arrays.items():
+        start = layout[name]["offset"]
+        blob[start:start + array.nbytes] = np.frombuffer(array.tobytes(), dtype=np.uint8)
+    np.save(path, blob, allow_pickle=False)
+
+def read_bundle(path):
+    """Memory-map a bundle; returns (header, {name: read-only array view})"""
+    blob = np.load(path, mmap_mode="r", allow_pickle=False)
+    if bytes(blob[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a model bundle")
+    header_length = int(blob[len(MAGIC):len(MAGIC) + 4].view(np.uint32)[0])
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(blob[start:start + header_length]).decode("utf-8"))
+    if header.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported model bundle version {header.get('version')} in {path}")
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        raw = blob[spec["offset"]:spec["offset"] + spec["nbytes"]]
+        arrays[name] = raw.view(np.dtype(spec["dtype"])).reshape(spec["shape"])
+    return header, arrays
+
+def convert_pickles(model_dir, path=BUNDLE_FILE):
+    """Build a bundle from rf_classifier.pkl, tfidf_vectorizer.pkl, label_encoder.pkl and model_config.json"""
+    import pickle
+
+    with open(os.path.join(model_dir, "rf_classifier.pkl"), "rb") as f:
+        clf = pickle.load(f)
+    with open(os.path.join(model_dir, "tfidf_vectorizer.pkl"), "rb") as f:
+        vectorizer = pickle.load(f)
+    with open(os.path.join(model_dir, "label_encoder.pkl"), "rb") as f:
+        label_encoder = pickle.load(f)
+    with open(os.path.join(model_dir, "model_config.json"), "r") as f:
+        config = json.load(f)
+
+    tfidf = export_vectorizer(vectorizer)
+    terms = sorted(tfidf.pop("vocabulary").items(), key=lambda item: item[1])
+    if [column for _, column in terms] != list(range(len(terms))):
+        raise ValueError("TF-IDF vocabulary columns are not contiguous")
+    idf = tfidf.pop("idf")
+
+    arrays = {
+        "tfidf_terms": np.array([term for term, _ in terms]),
+        "label_classes": np.asarray(label_encoder.classes_).astype(str)
+    }
+    if idf is not None:
+        arrays["tfidf_idf"] = np.asarray(idf, dtype=np.float64)
+    arrays.update(forest_arrays(clf))
+    write_bundle(path, arrays, {"config": config, "tfidf": tfidf})
+    return path
+
+def load_bundle(path=BUNDLE_FILE):
+    """Load a bundle as (clf, vectorizer, label_encoder, config), like direct_analyze.load_model_components"""
+    header, arrays = read_bundle(path)
+    tfidf = dict(header["tfidf"])
+    tfidf["version"] = EXPORT_VERSION
+    tfidf["vocabulary"] = {str(term): column for column, term in enumerate(arrays["tfidf_terms"])}
+    tfidf["idf"] = arrays.get("tfidf_idf")
+    classes = arrays["label_classes"]
+    return (
+        ForestPredictor(arrays, np.arange(len(classes))),
+        FastTfidf(tfidf),
+        BundleLabelEncoder(classes),
+        header["config"]
+    )
+
+def find_bundle():
+    """Bundle path from LEGAL_MODEL_BUNDLE or next to this module, or None"""
+    path = os.environ.get("LEGAL_MODEL_BUNDLE") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), BUNDLE_FILE
+    )
+    return path if os.path.exists(path) else None
+
+MEASURE_SCRIPT = """
+import json, sys, time, warnings
+warnings.filterwarnings("ignore")
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+import numpy, scipy.sparse, sklearn.ensemble, sklearn.feature_extraction.text
+before = rss_kb()
+start = time.perf_counter()
+if sys.argv[1] == "bundle":
+    from model_bundle import load_bundle
+    clf, vectorizer, label_encoder, config = load_bundle(sys.argv[2])
+else:
+    import pickle, os
+    from fast_tfidf import restore_idf
+    for name in ("rf_classifier.pkl", "tfidf_vectorizer.pkl", "label_encoder.pkl"):
+        with open(os.path.join(sys.argv[2], name), "rb") as f:
+            obj = pickle.load(f)
+        if name == "rf_classifier.pkl":
+            clf = obj
+        elif name == "tfidf_vectorizer.pkl":
+            vectorizer = restore_idf(obj)
+load_ms = (time.perf_counter() - start) * 1000
+clf.predict_proba(vectorizer.transform(["the accused stole a phone from the shop"]))
+print(json.dumps({"load_ms": load_ms, "rss_kb": rss_kb() - before}))
+"""
+
+def report(model_dir, path=BUNDLE_FILE):
+    """Load time and RSS growth of the pickles vs the bundle, each in a fresh process, plus an output check"""
+    import pickle
+    from fast_tfidf import restore_idf
+    from keyword_classifier import load_dataset_rows
+    from text_normalizer import normalize_text
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    for kind, target in (("pickles", model_dir), ("bundle", path)):
+        output = subprocess.run([sys.executable, "-c", MEASURE_SCRIPT, kind, os.path.abspath(target)],
+                                cwd=here, capture_output=True, text=True, check=True).stdout
+        stats = json.loads(output.strip().splitlines()[-1])
+        print(f"{kind:>8}: load {stats['load_ms']:7.1f} ms, RSS +{stats['rss_kb'] / 1024:5.1f} MB")
+
+    with open(os.path.join(model_dir, "rf_classifier.pkl"), "rb") as f:
+        clf = pickle.load(f)
+    with open(os.path.join(model_dir, "tfidf_vectorizer.pkl"), "rb") as f:
+        vectorizer = restore_idf(pickle.load(f))
+    bundle_clf, bundle_vectorizer, _, _ = load_bundle(path)
+    texts = [normalize_text(f"{row['Description']}. {row['Keywords']}") for row in load_dataset_rows()]
+    expected = clf.predict_proba(vectorizer.transform(texts))
+    actual = bundle_clf.predict_proba(bundle_vectorizer.transform(texts))
+    print(f"Bundle size: {os.path.getsize(path) / 1024:.0f} KB")
+    print(f"Max probability difference on {len(texts)} texts: {np.abs(expected - actual).max():.2e}, "
+          f"same predictions: {bool((expected.argmax(axis=1) == actual.argmax(axis=1)).all())}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Single-file memory-mapped bundle of the RandomForest model")
+    parser.add_argument("--convert", action="store_true", help="Build the bundle from the pickles")
+    parser.add_argument("--report", action="store_true", help="Compare load time and RSS with the pickles")
+    parser.add_argument("--output", default=BUNDLE_FILE, help="Bundle path")
+    parser.add_argument("--from", dest="source", help="Directory with the pickles (default: the registry's current version, else this directory)")
+    args = parser.parse_args()
+
+    from direct_analyze import active_model_dir
+
+    source = args.source or active_model_dir()
+    if args.convert:
+        print(f"Wrote {convert_pickles(source, args.output)}")
+    if args.report:
+        report(source, args.output)
@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+
+# models/
+#   versions/<version>/   immutable copy of one trained model plus manifest.json
+#   CURRENT               {"version": ...}, replaced atomically on activation
+REGISTRY_DIR = os.environ.get("LEGAL_MODEL_REGISTRY") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "models"
+)
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+CHECK_INTERVAL = 1.0  # Seconds between looks at the CURRENT pointer
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def rss_kb():
+    """Resident set size of this process in KB, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+def write_atomic(path, data):
+    """Write bytes to path so readers see either the old or the new file, never a partial one"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class LoadedModel:
+    """One loaded version: its components plus what loading it cost"""
+
+    def __init__(self, version, components, load_ms, rss_kb, disk_bytes):
+        self.version = version
+        self.components = components
+        self.load_ms = load_ms
+        self.rss_kb = rss_kb
+        self.disk_bytes = disk_bytes
+        self.loaded_at = time.time()
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "load_ms": self.load_ms,
+            "rss_kb": self.rss_kb,
+            "disk_bytes": self.disk_bytes,
+            "loaded_at": self.loaded_at
+        }
+
+class ModelRegistry:
+    """Immutable model versions with an atomically switched current pointer
+
+    publish() copies files into a hidden staging directory and renames it into
+    place, so a version directory is either complete or absent. activate()
+    replaces CURRENT in one rename. get() returns the loaded current version;
+    when CURRENT changes, the new version is loaded beside the old one and then
+    swapped in, so a request holding the previous LoadedModel finishes on it.
+    A version that fails to load is reported once and skipped, and the
+    previous one keeps serving.
+    """
+
+    def __init__(self, root=REGISTRY_DIR, loader=None, check_interval=CHECK_INTERVAL):
+        self.root = root
+        self.versions_dir = os.path.join(root, "versions")
+        self.current_file = os.path.join(root, CURRENT)
+        self.loader = loader
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._active = None
+        self._loading = False
+        self._checked_at = 0.0
+        self.history = []  # stats() of every version loaded by this process
+        self.failed = {}  # version -> load error, never retried (versions are immutable)
+
+    @property
+    def active(self):
+        """The loaded version without checking CURRENT or loading anything"""
+        return self._active
+
+    def list_versions(self):
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(name for name in os.listdir(self.versions_dir) if not name.startswith("."))
+
+    def version_path(self, version):
+        path = os.path.join(self.versions_dir, version)
+        if not os.path.exists(os.path.join(path, MANIFEST)):
+            raise KeyError(f"Model version '{version}' is not in the registry at {self.root}")
+        return path
+
+    def manifest(self, version):
+        with open(os.path.join(self.version_path(version), MANIFEST), "r") as f:
+            return json.load(f)
+
+    def current_version(self):
+        try:
+            with open(self.current_file, "r") as f:
+                return json.load(f)["version"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def publish(self, files, version=None, activate=False, metadata=None):
+        """Copy model files into a new immutable version; returns the version name"""
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.versions_dir, prefix=".staging-")
+        try:
+            entries = {}
+            for source in files:
+                name = os.path.basename(source)
+                target = os.path.join(staging, name)
+                shutil.copyfile(source, target)
+                entries[name] = {"sha256": file_sha256(target), "bytes": os.path.getsize(target)}
+
+            if version is None:
+                content = hashlib.sha256(json.dumps(entries, sort_keys=True).encode("utf-8")).hexdigest()
+                version = time.strftime("%Y%m%d-%H%M%S") + "-" + content[:8]
+            manifest = {"version": version, "created": time.time(), "files": entries, "metadata": metadata or {}}
+            with open(os.path.join(staging, MANIFEST), "w") as f:
+                json.dump(manifest, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+
+            for name in os.listdir(staging):
+                os.chmod(os.path.join(staging, name), stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            final = os.path.join(self.versions_dir, version)
+            if os.path.exists(final):
+                raise ValueError(f"Model version '{version}' already exists")
+            os.rename(staging, final)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Point CURRENT at an existing version"""
+        self.version_path(version)
+        write_atomic(self.current_file, json.dumps({"version": version, "activated": time.time()}).encode("utf-8"))
+        self._checked_at = 0.0
+
+    def load(self, version):
+        """Load one version with the registry's loader and measure it"""
+        path = self.version_path(version)
+        disk_bytes = sum(entry["bytes"] for entry in self.manifest(version)["files"].values())
+        rss_before = rss_kb()
+        start = time.perf_counter()
+        components = self.loader(path)
+        load_ms = (time.perf_counter() - start) * 1000
+        rss_after = rss_kb()
+        rss = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        return LoadedModel(version, components, load_ms, rss, disk_bytes)
+
+    def get(self):
+        """The loaded current version, or None when nothing is activated
+
+        Checks CURRENT at most every check_interval seconds. Callers should
+        fetch once per request and use that LoadedModel for the whole request.
+        """
+        active = self._active
+        if active is not None and (self._loading or time.monotonic() - self._checked_at < self.check_interval):
+            return active
+
+        with self._lock:
+            if self._active is not None and (self._loading or time.monotonic() - self._checked_at < self.check_interval):
+                return self._active
+            self._checked_at = time.monotonic()
+            version = self.current_version()
+            if version is None or (self._active is not None and self._active.version == version):
+                return self._active
+            if self._active is None:
+                # Nothing to serve yet, so callers wait for the first load and see its error
+                return self._swap_in(self.load(version))
+            if version in self.failed:
+                return self._active
+            self._loading = True
+
+        # Other requests keep getting the previous version while this one loads
+        try:
+            loaded = self.load(version)
+        except Exception as e:
+            with self._lock:
+                self._loading = False
+                self.failed[version] = f"{type(e).__name__}: {e}"
+                print(f"Model version {version} failed to load ({self.failed[version]}); "
+                      f"still serving {self._active.version}", file=sys.stderr)
+                return self._active
+        with self._lock:
+            self._loading = False
+            return self._swap_in(loaded)
+
+    def _swap_in(self, loaded):
+        self.history.append(loaded.stats())
+        self._active = loaded
+        return loaded
+
+    def stats(self):
+        return {
+            "root": self.root,
+            "current": self.current_version(),
+            "active": self._active.stats() if self._active else None,
+            "versions": self.list_versions(),
+            "loaded": list(self.history),
+            "failed": dict(self.failed)
+        }
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Versioned RandomForest model registry")
+    parser.add_argument("--root", default=REGISTRY_DIR, help="Registry directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish_parser = commands.add_parser("publish", help="Copy model files into a new version")
+    publish_parser.add_argument("--from", dest="source", help="Directory with the model files (default: this directory)")
+    publish_parser.add_argument("--version", help="Version name (default: timestamp and content hash)")
+    publish_parser.add_argument("--activate", action="store_true", help="Make it the current version")
+    activate_parser = commands.add_parser("activate", help="Switch the current version")
+    activate_parser.add_argument("version")
+    commands.add_parser("list", help="List versions")
+    commands.add_parser("stats", help="Load the current version and print its load time and memory")
+    args = parser.parse_args()
+
+    from direct_analyze import MODEL_FILES, find_model_dir, load_components_from
+
+    registry = ModelRegistry(args.root, loader=load_components_from)
+    if args.command == "publish":
+        source = args.source or find_model_dir()
+        files = [os.path.join(source, name) for name in MODEL_FILES]
+        with open(os.path.join(source, "model_config.json"), "r") as f:
+            config = json.load(f)
+        version = registry.publish(files, version=args.version, activate=args.activate,
+                                   metadata={"source": os.path.abspath(source), "accuracy": config.get("accuracy")})
+        print(f"Published {version}" + (" (current)" if args.activate else ""))
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"Current version: {args.version}")
+    elif args.command == "list":
+        current = registry.current_version()
+        for version in registry.list_versions():
+            print(("* " if version == current else "  ") + version)
+    elif args.command == "stats":
+        registry.get()
+        print(json.dumps(registry.stats(), indent=2))
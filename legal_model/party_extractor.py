@@ -0,0 +1,132 @@
+import re
+import sys
+import time
+
+# Compiled once and scanned one pass per pattern: the kinds overlap ("Ramesh Person A",
+# "Ramesh The Accused"), so a single alternation would let a name hide a reference or role
+PERSON_PATTERN = re.compile(r"(person\s+[A-Za-z])\b", re.IGNORECASE)
+NAME_PATTERN = re.compile(r"\b([A-Z][a-z]+\s+[A-Z][a-z]+)\b")
+ROLE_PATTERN = re.compile(r"\b(the\s+(accused|victim|complainant))\b", re.IGNORECASE)
+ROLES = ("accused", "victim", "complainant")
+ACCUSED_PATTERN = re.compile(r"accused", re.IGNORECASE)
+VICTIM_PATTERN = re.compile(r"victim", re.IGNORECASE)
+
+def add_unique(parties, seen, value, key):
+    """Append value unless its case-insensitive key was already seen"""
+    if key not in seen:
+        seen.add(key)
+        parties.append(value)
+
+def extract_parties(text, max_chars=None):
+    """Extract only the relevant parties (people) from the case text
+
+    Returns "Person A"-style references first, then capitalized two-word
+    names, then roles such as "The Accused", without case-insensitive
+    duplicates. max_chars limits how much of a long judgment is scanned.
+    """
+    if max_chars is not None:
+        text = text[:max_chars]
+
+    persons = [match.group(1).title() for match in PERSON_PATTERN.finditer(text)]
+    names = [match.group(1) for match in NAME_PATTERN.finditer(text)]
+    roles = {role: [] for role in ROLES}
+    for match in ROLE_PATTERN.finditer(text):
+        roles[match.group(2).lower()].append(match.group(1).title())
+
+    parties = []
+    seen = set()
+    for group in [persons, names] + [roles[role] for role in ROLES]:
+        for value in group:
+            add_unique(parties, seen, value, value.lower())
+
+    # If no parties found, but case has standard terminology
+    if not parties:
+        if ACCUSED_PATTERN.search(text):
+            parties.append("The Accused")
+        if VICTIM_PATTERN.search(text):
+            parties.append("The Victim")
+
+    return parties
+
+def extract_person_references(text, max_chars=None):
+    """Distinct "Person A"-style references in order of appearance"""
+    if max_chars is not None:
+        text = text[:max_chars]
+    parties = []
+    seen = set()
+    for match in PERSON_PATTERN.finditer(text):
+        add_unique(parties, seen, match.group(1).title(), match.group(1).lower())
+    return parties
+
+def legacy_extract_parties(text):
+    """The previous multi-pass implementation, kept only as the benchmark baseline"""
+    parties = []
+    for match in re.findall(r'(person\s+[A-Za-z])\b', text, re.IGNORECASE):
+        if match.lower() not in [p.lower() for p in parties]:
+            parties.append(match.title())
+    for match in re.findall(r'\b([A-Z][a-z]+\s+[A-Z][a-z]+)\b', text):
+        if match.lower() not in [p.lower() for p in parties]:
+            parties.append(match)
+    for pattern in [r'\b(the\s+accused)\b', r'\b(the\s+victim)\b', r'\b(the\s+complainant)\b']:
+        for match in re.findall(pattern, text, re.IGNORECASE):
+            if match.lower() not in [p.lower() for p in parties]:
+                parties.append(match.title())
+    if not parties:
+        if "accused" in text.lower():
+            parties.append("The Accused")
+        if "victim" in text.lower():
+            parties.append("The Victim")
+    return parties
+
+def benchmark(min_chars=100_000, repeats=3):
+    """Time the precompiled extractor against the old one on full judgment texts"""
+    from case_data import list_case_files, iter_corpus
+
+    texts = []
+    seen = set()
+    for _, record in iter_corpus(list_case_files("*.json")):
+        if record.get("doc_id") in seen or not record.get("full_text"):
+            continue
+        seen.add(record.get("doc_id"))
+        texts.append(record["full_text"])
+
+    # Join judgments into documents of at least min_chars, like long full-text inputs
+    documents = []
+    current = ""
+    for text in texts:
+        current += text + "\n"
+        if len(current) >= min_chars:
+            documents.append(current)
+            current = ""
+    if current and documents:
+        documents[-1] += current
+    elif current:
+        documents.append(current)
+
+    def best_time(func):
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for document in documents:
+                func(document)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000 / len(documents)
+
+    mismatches = sum(extract_parties(d) != legacy_extract_parties(d) for d in documents)
+    legacy_ms = best_time(legacy_extract_parties)
+    compiled_ms = best_time(extract_parties)
+
+    total_chars = sum(len(d) for d in documents)
+    print(f"Documents: {len(documents)} (avg {total_chars / len(documents) / 1000:.0f} KB)")
+    print(f"Parties per document: {sum(len(extract_parties(d)) for d in documents) / len(documents):.0f}")
+    print(f"Multi-pass:  {legacy_ms:.2f} ms per document")
+    print(f"Precompiled: {compiled_ms:.2f} ms per document ({legacy_ms / compiled_ms:.1f}x faster)")
+    print(f"Documents with different output: {mismatches}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        benchmark()
+    elif len(sys.argv) > 1:
+        for party in extract_parties(' '.join(sys.argv[1:])):
+            print(party)
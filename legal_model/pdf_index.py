@@ -0,0 +1,205 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+SNIPPET_CONTEXT = 120
+
+TERM_PATTERN = re.compile(r"[a-z0-9]+")
+# Section headings in the statute text look like "103. Punishment for murder.—"
+HEADING_PATTERN = re.compile(r"(?m)^\s*(\d+[A-Z]?)\.\s")
+SECTION_QUERY = re.compile(r"^\s*(?:section|sec\.?|s\.)\s*(\d+[a-z]?)\s*$", re.IGNORECASE)
+
+def find_default_pdf():
+    """Locate the bundled a2023-45.pdf"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    possible_paths = [
+        os.path.join(current_dir, "a2023-45.pdf"),
+        os.path.join(os.path.dirname(current_dir), "pinggg-legal-model", "final_export", "final_export", "a2023-45.pdf"),
+    ]
+
+    for path in possible_paths:
+        if os.path.exists(path):
+            return path
+
+    raise FileNotFoundError("Could not find a2023-45.pdf in any of the expected locations")
+
+def file_sha256(path):
+    """Hash a file in chunks so the index can be tied to one PDF version"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def tokenize(text):
+    """Yield (term, character offset) pairs for a page"""
+    for match in TERM_PATTERN.finditer(text.lower()):
+        yield match.group(), match.start()
+
+class PdfIndex:
+    """Positional inverted index over the pages of a PDF
+
+    Postings map each term to a flat list of (page, position, offset) triples,
+    where position is the token number on the page and offset the character
+    offset in the extracted page text.
+    """
+
+    def __init__(self, pdf_sha256, pages, postings, headings):
+        self.pdf_sha256 = pdf_sha256
+        self.pages = pages
+        self.postings = postings
+        self.headings = headings
+
+    @classmethod
+    def build(cls, pdf_path):
+        """Extract every page of the PDF and index it"""
+        import PyPDF2
+
+        pages = []
+        postings = {}
+        headings = {}
+        with open(pdf_path, "rb") as f:
+            reader = PyPDF2.PdfReader(f)
+            for page_num, page in enumerate(reader.pages):
+                text = page.extract_text() or ""
+                pages.append(text)
+
+                for position, (term, offset) in enumerate(tokenize(text)):
+                    postings.setdefault(term, []).extend((page_num, position, offset))
+
+                for match in HEADING_PATTERN.finditer(text):
+                    headings.setdefault(match.group(1).upper(), []).append([page_num, match.start(1)])
+
+        return cls(file_sha256(pdf_path), pages, postings, headings)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "pdf_sha256": self.pdf_sha256,
+                "pages": self.pages,
+                "postings": self.postings,
+                "headings": self.headings,
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"{path} was written by a different index version")
+        return cls(data["pdf_sha256"], data["pages"], data["postings"], data["headings"])
+
+    def snippet(self, page_num, offset, length):
+        """Text around a hit with whitespace collapsed"""
+        text = self.pages[page_num]
+        start = max(0, offset - SNIPPET_CONTEXT)
+        end = min(len(text), offset + length + SNIPPET_CONTEXT)
+        return " ".join(text[start:end].split())
+
+    def _triples(self, term):
+        flat = self.postings.get(term, [])
+        return zip(flat[0::3], flat[1::3], flat[2::3])
+
+    def phrase_hits(self, phrase):
+        """Find (page, offset) pairs where the terms of the phrase occur consecutively"""
+        terms = [term for term, _ in tokenize(phrase)]
+        if not terms:
+            return []
+
+        following = []
+        for term in terms[1:]:
+            if term not in self.postings:
+                return []
+            following.append({(page, position) for page, position, _ in self._triples(term)})
+
+        hits = []
+        for page, position, offset in self._triples(terms[0]):
+            if all((page, position + i + 1) in positions for i, positions in enumerate(following)):
+                hits.append((page, offset))
+        return hits
+
+    def search(self, query, limit=10):
+        """Search for a phrase or a "Section 302"-style reference
+
+        Section queries return the section's heading first, followed by the
+        places where the section is cited in the text.
+        """
+        results = []
+        match = SECTION_QUERY.match(query)
+        if match:
+            section = match.group(1).upper()
+            for page_num, offset in self.headings.get(section, []):
+                results.append({
+                    "page": page_num + 1,
+                    "offset": offset,
+                    "kind": "heading",
+                    "snippet": self.snippet(page_num, offset, len(section)),
+                })
+
+        for page_num, offset in self.phrase_hits(query):
+            results.append({
+                "page": page_num + 1,
+                "offset": offset,
+                "kind": "phrase",
+                "snippet": self.snippet(page_num, offset, len(query)),
+            })
+            if len(results) >= limit:
+                break
+
+        return results[:limit]
+
+def load_pdf_index(pdf_path=None):
+    """Load the persisted index for a PDF, building it once per PDF version"""
+    if pdf_path is None:
+        pdf_path = find_default_pdf()
+    index_path = pdf_path + INDEX_SUFFIX
+
+    if os.path.exists(index_path):
+        try:
+            index = PdfIndex.load(index_path)
+            if index.pdf_sha256 == file_sha256(pdf_path):
+                return index
+        except (ValueError, KeyError):
+            pass
+
+    index = PdfIndex.build(pdf_path)
+    index.save(index_path)
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the statutory text of the bundled legal PDFs")
+    parser.add_argument("query", nargs="?", help='Phrase or section reference, e.g. "Section 103"')
+    parser.add_argument("--pdf", type=str, help="PDF to index (defaults to a2023-45.pdf)")
+    parser.add_argument("--limit", type=int, default=10, help="Maximum number of hits to show")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index even if it is current")
+    args = parser.parse_args()
+
+    pdf_path = args.pdf or find_default_pdf()
+    start = time.perf_counter()
+    if args.rebuild:
+        index = PdfIndex.build(pdf_path)
+        index.save(pdf_path + INDEX_SUFFIX)
+    else:
+        index = load_pdf_index(pdf_path)
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"Index for {os.path.basename(pdf_path)} ready: {len(index.pages)} pages, "
+          f"{len(index.postings)} terms ({load_ms:.1f} ms)")
+
+    if args.query:
+        start = time.perf_counter()
+        results = index.search(args.query, limit=args.limit)
+        search_ms = (time.perf_counter() - start) * 1000
+        print(f"\n{len(results)} hits for '{args.query}' ({search_ms:.2f} ms)")
+        for result in results:
+            print(f"\nPage {result['page']} [{result['kind']}]:")
+            print(f"  ...{result['snippet']}...")
+
+if __name__ == "__main__":
+    main()
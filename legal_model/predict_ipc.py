@@ -1,18 +1,192 @@
+import hashlib
 import json
-import numpy as np
-from keras.models import load_model
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.preprocessing import LabelEncoder
+import os
 import re
+import sys
+import numpy as np
 
-def load_model_components():
-    """Load the trained model and its components"""
-    model = load_model('text_prediction_model.keras')
+from party_extractor import extract_person_references
+
+KERAS_MODEL = 'text_prediction_model.keras'
+NUMPY_MODEL = 'text_prediction_model.npz'
+VECTORIZER_FILE = 'vectorizer.json'
+CLASSES_FILE = 'label_encoder_classes.json'
+# The files an export is made from; their sizes and hashes are stored in it
+SOURCE_FILES = (KERAS_MODEL, VECTORIZER_FILE, CLASSES_FILE)
+# CountVectorizer's default tokenization, which the saved vocabulary was built with
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Loaded components, kept per process
+_model_components = None
+
+def relu(x):
+    return np.maximum(x, 0)
+
+def softmax(x):
+    exp = np.exp(x - x.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': relu,
+    'softmax': softmax,
+    'sigmoid': sigmoid,
+    'tanh': np.tanh
+}
+
+class NumpyModel:
+    """Forward pass of the exported Dense/Dropout/Activation stack in float32, like Keras"""
+
+    def __init__(self, kinds, activations, weights):
+        unknown = set(activations) - set(ACTIVATIONS)
+        if unknown:
+            raise ValueError(f"Unsupported activations in exported model: {', '.join(sorted(unknown))}")
+        self.layers = []
+        for i, (kind, activation) in enumerate(zip(kinds, activations)):
+            kernel, bias = weights.get(f'kernel_{i}'), weights.get(f'bias_{i}')
+            self.layers.append((kind, ACTIVATIONS[activation], kernel, bias))
+
+    def predict(self, X):
+        x = np.asarray(X, dtype=np.float32)
+        for kind, activation, kernel, bias in self.layers:
+            if kind == 'dense':
+                x = x @ kernel + bias
+            x = activation(x)
+        return x
+
+class CountLookup:
+    """Word counts over the saved CountVectorizer vocabulary without scikit-learn"""
+
+    def __init__(self, terms):
+        self.vocabulary = {term: column for column, term in enumerate(terms)}
+
+    def transform(self, texts):
+        X = np.zeros((len(texts), len(self.vocabulary)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                column = self.vocabulary.get(token)
+                if column is not None:
+                    X[row, column] += 1
+        return X
+
+class ClassLabels:
+    """The part of LabelEncoder used here"""
+
+    def __init__(self, classes):
+        self.classes_ = classes
+
+def source_signature(paths=SOURCE_FILES):
+    """{file: [size, sha256]} for the source files that exist"""
+    signature = {}
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                signature[os.path.basename(path)] = [os.path.getsize(path), hashlib.sha256(f.read()).hexdigest()]
+    return signature
+
+def export_is_current(npz_path=NUMPY_MODEL):
+    """Whether the export was made from the Keras files now on disk
+
+    Source files that are not on disk are not compared, so an export shipped
+    without them counts as current; one whose sources were retrained or
+    replaced since does not.
+    """
+    current = source_signature()
+    if not current:
+        return True
+    with np.load(npz_path, allow_pickle=False) as data:
+        if 'sources' not in data.files:
+            return False
+        stored = json.loads(str(data['sources']))
+    return all(stored.get(name) == entry for name, entry in current.items())
+
+def top3_mismatches(keras_components, numpy_components, texts):
+    """Indices of the texts whose top-3 classes differ between the Keras and NumPy models"""
+    keras_model, keras_vectorizer, _ = keras_components
+    numpy_model, numpy_vectorizer, _ = numpy_components
+    expected = keras_model.predict(keras_vectorizer.transform(texts).toarray(), verbose=0)
+    actual = numpy_model.predict(numpy_vectorizer.transform(texts))
+    expected_top = np.argsort(expected, axis=1)[:, -3:][:, ::-1]
+    actual_top = np.argsort(actual, axis=1)[:, -3:][:, ::-1]
+    return [i for i in range(len(texts)) if not np.array_equal(expected_top[i], actual_top[i])]
+
+def export_numpy_model(keras_path=KERAS_MODEL, npz_path=NUMPY_MODEL, texts=None):
+    """Dump the Keras model's layer weights, the vocabulary and the classes into one .npz
+
+    Needs Keras once; predictions afterwards only need NumPy. Before the file
+    is written, both models run on texts (by default the dataset descriptions
+    and judgment summaries) and any top-3 difference raises ValueError.
+    """
+    from keras.models import load_model
+
+    model = load_model(keras_path)
+    kinds, activations, weights = [], [], {}
+    for layer in model.layers:
+        name = type(layer).__name__
+        if name == 'Dense':
+            kernel, *rest = layer.get_weights()
+            weights[f'kernel_{len(kinds)}'] = kernel.astype(np.float32)
+            weights[f'bias_{len(kinds)}'] = (rest[0] if rest else np.zeros(kernel.shape[1])).astype(np.float32)
+            kinds.append('dense')
+            activations.append(layer.get_config()['activation'])
+        elif name == 'Activation':
+            kinds.append('activation')
+            activations.append(layer.get_config()['activation'])
+        elif name in ('Dropout', 'InputLayer'):
+            continue  # No-ops at inference
+        else:
+            raise ValueError(f"Cannot export layer type {name}")
+
+    with open(VECTORIZER_FILE, 'r') as f:
+        vocabulary = json.load(f)['vocabulary_']
+    with open(CLASSES_FILE, 'r') as f:
+        classes = json.load(f)
+
+    terms = sorted(vocabulary, key=lambda term: int(vocabulary[term]))
+    if [int(vocabulary[term]) for term in terms] != list(range(len(terms))):
+        raise ValueError("vectorizer.json vocabulary columns are not contiguous")
+
+    if texts is None:
+        from keyword_classifier import agreement_texts
+        texts = agreement_texts()
+    numpy_components = (NumpyModel(kinds, activations, weights), CountLookup(terms), ClassLabels(np.array(classes)))
+    mismatches = top3_mismatches(load_keras_components(keras_path), numpy_components, texts)
+    if mismatches:
+        raise ValueError(f"NumPy export differs from Keras in the top 3 for {len(mismatches)} of {len(texts)} "
+                         f"sample texts (first: {texts[mismatches[0]][:80]!r}); nothing was written")
+
+    np.savez(
+        npz_path,
+        layer_kinds=np.array(kinds),
+        layer_activations=np.array(activations),
+        vocabulary=np.array(terms),
+        classes=np.array(classes),
+        sources=np.array(json.dumps(source_signature([keras_path, VECTORIZER_FILE, CLASSES_FILE]))),
+        **weights
+    )
+    return npz_path
+
+def load_numpy_components(npz_path=NUMPY_MODEL):
+    with np.load(npz_path, allow_pickle=False) as data:
+        weights = {name: data[name] for name in data.files if name.startswith(('kernel_', 'bias_'))}
+        model = NumpyModel(data['layer_kinds'].tolist(), data['layer_activations'].tolist(), weights)
+        return model, CountLookup(data['vocabulary'].tolist()), ClassLabels(data['classes'])
+
+def load_keras_components(keras_path=KERAS_MODEL):
+    """Load the Keras model and rebuild the CountVectorizer and LabelEncoder"""
+    from keras.models import load_model
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.preprocessing import LabelEncoder
+
+    model = load_model(keras_path)
     
-    with open('vectorizer.json', 'r') as f:
+    with open(VECTORIZER_FILE, 'r') as f:
         vectorizer_data = json.load(f)
     
-    with open('label_encoder_classes.json', 'r') as f:
+    with open(CLASSES_FILE, 'r') as f:
         label_encoder_classes = json.load(f)
     
     vectorizer = CountVectorizer(max_features=vectorizer_data['max_features'])
@@ -23,14 +197,26 @@ def load_model_components():
     
     return model, vectorizer, label_encoder
 
+def load_model_components():
+    """Load the trained model and its components once per process
+
+    Uses the NumPy export when it exists and was made from the Keras files on
+    disk, so Keras is not imported at all. A stale export is ignored.
+    """
+    global _model_components
+    if _model_components is None:
+        if os.path.exists(NUMPY_MODEL) and export_is_current():
+            _model_components = load_numpy_components()
+        else:
+            if os.path.exists(NUMPY_MODEL):
+                print(f"{NUMPY_MODEL} was not exported from the current Keras files; using Keras "
+                      f"(run 'python predict_ipc.py --export' to refresh it)", file=sys.stderr)
+            _model_components = load_keras_components()
+    return _model_components
+
 def extract_parties(text):
     """Extract different parties involved in the incident"""
-    parties = []
-    # Look for patterns like "person A", "person B", etc.
-    party_matches = re.finditer(r'person\s+([A-Za-z])', text, re.IGNORECASE)
-    for match in party_matches:
-        parties.append(f"person {match.group(1)}")
-    return parties
+    return extract_person_references(text)
 
 def predict_ipc_sections(input_text):
     """Predict IPC sections for complex scenarios"""
@@ -65,7 +251,9 @@ def predict_ipc_sections(input_text):
     return results
 
 def main():
-    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == '--export':
+        print(f"Wrote {export_numpy_model()}")
+        return
     if len(sys.argv) > 1:
         input_text = sys.argv[1]
     else:
@@ -38,15 +38,8 @@ def analyze_self_defense_case(case_text):
     }
     
     # First look for Person A/B patterns
-    import re
-    person_pattern = r'(person\s+[A-Za-z])\b'
-    matches = re.findall(person_pattern, case_text, re.IGNORECASE)
-    parties = []
-    for match in matches:
-        if match.lower() not in [p.lower() for p in parties]:
-            parties.append(match.title())
-    
-    result["parties"] = parties
+    from party_extractor import extract_person_references
+    result["parties"] = extract_person_references(case_text)
     
     return result
 
@@ -0,0 +1,146 @@
+import re
+import string
+import sys
+import time
+
+# Versioned text transforms. Training records the name in model_config.json
+# ("normalizer") and inference looks it up, so a model always sees text
+# prepared exactly as it was at fit time. Never change a registered
+# transform; add a new version instead.
+#   letters-v1:    lowercase, every character that is not an ASCII letter or
+#                  whitespace becomes a space, whitespace collapsed (TF-IDF models)
+#   whitespace-v1: lowercase and collapse whitespace (transformer models)
+DEFAULT_NORMALIZER = "letters-v1"
+TRANSFORMER_NORMALIZER = "whitespace-v1"
+# Artifacts trained before the name was recorded were served with letters-v1
+LEGACY_NORMALIZER = "letters-v1"
+
+TOKEN_CACHE_SIZE = 50_000
+
+class LettersTable(dict):
+    """str.translate table for letters-v1, filled lazily for characters outside ASCII
+
+    Each character maps to what lower() followed by replacing non-letters
+    with spaces would give, so the result matches the regex version exactly
+    (including characters whose lowercase form is longer or is ASCII).
+    """
+
+    def __missing__(self, code):
+        value = ''.join(
+            c if c in string.ascii_lowercase or c.isspace() else ' '
+            for c in chr(code).lower()
+        )
+        self[code] = value
+        return value
+
+def _letters_table():
+    table = LettersTable()
+    for code in range(128):
+        table.__missing__(code)
+    return table
+
+class TextNormalizer:
+    """Callable text transform with an optional cache of per-token results
+
+    With token_cache the text is split on whitespace first and every distinct
+    raw token is translated once; legal text repeats the same words heavily.
+    """
+
+    def __init__(self, name, token_cache=False, cache_size=TOKEN_CACHE_SIZE):
+        if name not in NORMALIZERS:
+            raise ValueError(f"Unknown text normalizer '{name}', expected one of {', '.join(NORMALIZERS)}")
+        self.name = name
+        self.table = NORMALIZERS[name]()
+        self.token_cache = {} if token_cache else None
+        self.cache_size = cache_size
+
+    def __call__(self, text):
+        if self.token_cache is None:
+            if self.table is None:
+                return ' '.join(text.lower().split())
+            return ' '.join(text.translate(self.table).split())
+
+        cache = self.token_cache
+        pieces = []
+        for token in text.split():
+            value = cache.get(token)
+            if value is None:
+                if len(cache) >= self.cache_size:
+                    cache.clear()
+                value = token.lower() if self.table is None else token.translate(self.table)
+                value = cache[token] = ' '.join(value.split())
+            if value:
+                pieces.append(value)
+        return ' '.join(pieces)
+
+NORMALIZERS = {
+    "letters-v1": _letters_table,
+    "whitespace-v1": lambda: None,
+}
+
+_normalizers = {}
+
+def get_normalizer(name=DEFAULT_NORMALIZER):
+    """Shared normalizer instance for a registered version"""
+    if name not in _normalizers:
+        _normalizers[name] = TextNormalizer(name)
+    return _normalizers[name]
+
+def normalizer_for_config(config):
+    """The normalizer a model was trained with, from its model_config.json contents"""
+    return get_normalizer((config or {}).get("normalizer", LEGACY_NORMALIZER))
+
+def normalize_text(text):
+    """Lowercase, replace non-letters with spaces and collapse whitespace (letters-v1)"""
+    return get_normalizer(DEFAULT_NORMALIZER)(text)
+
+def regex_letters(text):
+    """The previous regex implementation of letters-v1, kept as the benchmark baseline"""
+    text = text.lower()
+    text = re.sub(r'[^a-zA-Z\s]', ' ', text)
+    return ' '.join(text.split())
+
+def regex_whitespace(text):
+    """The previous regex implementation of whitespace-v1"""
+    text = text.lower().strip()
+    return re.sub(r'\s+', ' ', text)
+
+def benchmark(repeats=5):
+    """Time the translate-based normalizers against the regex ones on the case corpus"""
+    from case_data import list_case_files, iter_corpus
+
+    texts = []
+    for _, record in iter_corpus(list_case_files("*.json")):
+        texts.extend(t for t in (record.get("full_text"), record.get("summary")) if t)
+    texts.append("Ünïcödé Straße – K (Kelvin) İstanbul ½ 302/34 IPC tab\there")
+
+    def best_time(func):
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for text in texts:
+                func(text)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000
+
+    total_mb = sum(len(t) for t in texts) / 1e6
+    print(f"Texts: {len(texts)} ({total_mb:.1f} MB)")
+    for name, baseline in (("letters-v1", regex_letters), ("whitespace-v1", regex_whitespace)):
+        plain = TextNormalizer(name)
+        cached = TextNormalizer(name, token_cache=True)
+        mismatches = sum(plain(t) != baseline(t) or cached(t) != baseline(t) for t in texts)
+        regex_ms = best_time(baseline)
+        plain_ms = best_time(plain)
+        cached_ms = best_time(cached)
+        print(f"{name}:")
+        print(f"  regex:             {regex_ms:8.1f} ms")
+        print(f"  translate:         {plain_ms:8.1f} ms ({regex_ms / plain_ms:.1f}x)")
+        print(f"  translate + cache: {cached_ms:8.1f} ms ({regex_ms / cached_ms:.1f}x)")
+        print(f"  texts with different output: {mismatches}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        benchmark()
+    elif len(sys.argv) > 1:
+        print(normalize_text(' '.join(sys.argv[1:])))
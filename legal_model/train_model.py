@@ -14,6 +14,8 @@ import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 import pickle
+import shutil
+import tempfile
 from sentence_transformers import SentenceTransformer
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
@@ -26,6 +28,10 @@ from transformers import EarlyStoppingCallback, IntervalStrategy
 from datasets import Dataset
 from tqdm.auto import tqdm
 
+from long_document import aggregate, window_evidence
+from model_registry import ModelRegistry
+from text_normalizer import DEFAULT_NORMALIZER, TRANSFORMER_NORMALIZER, get_normalizer, normalizer_for_config
+
 # Try to import XGBoost, but continue without it if not available
 try:
     from xgboost import XGBClassifier
@@ -370,13 +376,12 @@ def create_comprehensive_ipc_dataset():
     
     return df_balanced
 
+# Saved transformers loaded by load_transformer, by model directory
+_transformers = {}
+
 def preprocess_text(text):
     """Preprocess text for transformer models"""
-    # Basic cleaning
-    text = text.lower().strip()
-    text = re.sub(r'\s+', ' ', text)  # Remove extra whitespace
-    
-    return text
+    return get_normalizer(TRANSFORMER_NORMALIZER)(text)
 
 def create_balanced_dataset():
     """Create a balanced dataset with manual examples"""
@@ -579,8 +584,8 @@ def fine_tune_transformer_model():
     model.save_pretrained(model_dir)
     tokenizer.save_pretrained(model_dir)
     
-    # Save label encoder
-    with open('label_encoder.pkl', 'wb') as f:
+    # Save label encoder next to the transformer, not over the RandomForest's
+    with open(os.path.join(model_dir, 'label_encoder.pkl'), 'wb') as f:
         pickle.dump(label_encoder, f)
     
     # Save configuration
@@ -588,10 +593,11 @@ def fine_tune_transformer_model():
         'model_type': model_name,
         'num_classes': len(label_encoder.classes_),
         'classes': label_encoder.classes_.tolist(),
-        'accuracy': float(eval_results.get('eval_accuracy', 0))
+        'accuracy': float(eval_results.get('eval_accuracy', 0)),
+        'normalizer': TRANSFORMER_NORMALIZER
     }
     
-    with open('model_config.json', 'w') as f:
+    with open(os.path.join(model_dir, 'model_config.json'), 'w') as f:
         json.dump(config, f)
     
     # Test model with a few examples
@@ -612,26 +618,79 @@ def fine_tune_transformer_model():
     
     return model, tokenizer, label_encoder, config
 
-def predict_section(text, model_dir="./legal_model"):
-    """Make a prediction using the saved transformer model"""
-    # Load components
-    tokenizer = AutoTokenizer.from_pretrained(model_dir)
-    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
-    
-    with open('label_encoder.pkl', 'rb') as f:
-        label_encoder = pickle.load(f)
-    
-    # Preprocess
-    processed_text = preprocess_text(text)
-    
-    # Tokenize
+def load_transformer(model_dir="./legal_model"):
+    """Tokenizer, model and label encoder of a saved transformer, loaded once per process"""
+    if model_dir not in _transformers:
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+        model.eval()
+        if torch.cuda.is_available():
+            model.cuda()
+        
+        # The working directory's label_encoder.pkl may belong to the RandomForest, so never fall back to it
+        encoder_path = os.path.join(model_dir, 'label_encoder.pkl')
+        if not os.path.exists(encoder_path):
+            raise FileNotFoundError(
+                f"{encoder_path} not found; retrain the transformer or copy the label encoder saved with it into {model_dir}"
+            )
+        with open(encoder_path, 'rb') as f:
+            label_encoder = pickle.load(f)
+        
+        _transformers[model_dir] = (tokenizer, model, label_encoder)
+    return _transformers[model_dir]
+
+def predict_section_proba(text, model_dir="./legal_model"):
+    """Probability of every section under the transformer, as [(section, probability)]"""
+    tokenizer, model, label_encoder = load_transformer(model_dir)
     inputs = tokenizer(
-        processed_text,
+        preprocess_text(text),
         return_tensors="pt",
         padding=True,
         truncation=True,
         max_length=256
     )
+    if torch.cuda.is_available():
+        inputs = {k: v.cuda() for k, v in inputs.items()}
+    with torch.no_grad():
+        probabilities = torch.nn.functional.softmax(model(**inputs).logits, dim=-1)[0]
+    return list(zip(label_encoder.classes_, probabilities.cpu().tolist()))
+
+def predict_section(text, model_dir="./legal_model", aggregation=None, stride=64):
+    """Make a prediction using the saved transformer model
+    
+    By default the text is truncated to 256 tokens. With aggregation ("max",
+    "mean" or "attention") the whole text is split into 256-token windows that
+    overlap by stride tokens, all windows run through the model as one batch,
+    and (section, confidence, evidence) is returned with per-window spans.
+    """
+    # Load components
+    tokenizer, model, label_encoder = load_transformer(model_dir)
+    
+    # Preprocess
+    processed_text = preprocess_text(text)
+    
+    # Tokenize
+    if aggregation:
+        inputs = tokenizer(
+            processed_text,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=256,
+            stride=stride,
+            return_overflowing_tokens=True,
+            return_offsets_mapping=True
+        )
+        offsets = inputs.pop("offset_mapping").tolist()
+        inputs.pop("overflow_to_sample_mapping", None)
+    else:
+        inputs = tokenizer(
+            processed_text,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=256
+        )
     
     # Move to GPU if available
     if torch.cuda.is_available():
@@ -646,6 +705,20 @@ def predict_section(text, model_dir="./legal_model"):
     logits = outputs.logits
     probabilities = torch.nn.functional.softmax(logits, dim=-1)
     
+    if aggregation:
+        window_probs = probabilities.cpu().numpy()
+        combined, weights = aggregate(window_probs, aggregation)
+        predicted_class = int(np.argmax(combined))
+        confidence = float(combined[predicted_class])
+        # Character span of each window in the preprocessed text, ignoring special and padding tokens
+        windows = []
+        for window_offsets in offsets:
+            spans = [(start, end) for start, end in window_offsets if end > start]
+            start, end = (spans[0][0], spans[-1][1]) if spans else (0, 0)
+            windows.append((start, end, processed_text[start:end]))
+        evidence = window_evidence(windows, window_probs, weights, predicted_class, label_encoder.classes_)
+        return label_encoder.inverse_transform([predicted_class])[0], confidence, evidence
+    
     predicted_class = torch.argmax(probabilities, dim=-1).item()
     confidence = probabilities[0][predicted_class].item()
     
@@ -654,23 +727,21 @@ def predict_section(text, model_dir="./legal_model"):
     
     return section, confidence
 
-def predict_section_rf(text, model_path='rf_classifier.pkl', vectorizer_path='tfidf_vectorizer.pkl', encoder_path='label_encoder.pkl'):
-    """Make a prediction using the RandomForest model"""
-    # Load components
-    with open(model_path, 'rb') as f:
-        clf = pickle.load(f)
+def predict_section_rf(text):
+    """Make a prediction using the RandomForest the analyzers serve
     
-    with open(vectorizer_path, 'rb') as f:
-        vectorizer = pickle.load(f)
+    The model comes from direct_analyze.load_active_model(): the registry's
+    current version, else the bundle or the pickles next to direct_analyze.py.
+    """
+    from direct_analyze import load_active_model
     
-    with open(encoder_path, 'rb') as f:
-        label_encoder = pickle.load(f)
+    (clf, vectorizer, label_encoder, config), _ = load_active_model()
     
-    # Preprocess
-    processed_text = preprocess_text(text)
+    # Preprocess with the transform recorded at training time
+    processed_text = normalizer_for_config(config)(text)
     
     # Vectorize
-    features = vectorizer.transform([processed_text]).toarray()
+    features = vectorizer.transform([processed_text])
     
     # Predict
     prediction = clf.predict(features)[0]
@@ -696,8 +767,9 @@ if __name__ == "__main__":
             df = create_manual_training_set()
             print(f"Using {len(df)} manual training examples")
             
-            # Preprocess text
-            df['processed_text'] = df['text'].apply(preprocess_text)
+            # Preprocess text with the same versioned transform used at inference
+            normalize = get_normalizer(DEFAULT_NORMALIZER)
+            df['processed_text'] = df['text'].apply(normalize)
             
             # Use basic TF-IDF vectorization
             from sklearn.feature_extraction.text import TfidfVectorizer
@@ -727,14 +799,15 @@ if __name__ == "__main__":
             accuracy = accuracy_score(y_test, y_pred)
             print(f"\nRandom Forest accuracy: {accuracy:.2%}")
             
-            # Save components
-            with open('rf_classifier.pkl', 'wb') as f:
+            # Save components into a staging directory; the registry publishes them as a new version
+            staging_dir = tempfile.mkdtemp(prefix="rf-model-")
+            with open(os.path.join(staging_dir, 'rf_classifier.pkl'), 'wb') as f:
                 pickle.dump(clf, f)
             
-            with open('tfidf_vectorizer.pkl', 'wb') as f:
+            with open(os.path.join(staging_dir, 'tfidf_vectorizer.pkl'), 'wb') as f:
                 pickle.dump(vectorizer, f)
                 
-            with open('label_encoder.pkl', 'wb') as f:
+            with open(os.path.join(staging_dir, 'label_encoder.pkl'), 'wb') as f:
                 pickle.dump(label_encoder, f)
             
             # Save config
@@ -742,18 +815,29 @@ if __name__ == "__main__":
                 'model_type': 'RandomForest',
                 'num_classes': len(label_encoder.classes_),
                 'classes': label_encoder.classes_.tolist(),
-                'accuracy': float(accuracy)
+                'accuracy': float(accuracy),
+                'normalizer': normalize.name
             }
             
-            with open('model_config.json', 'w') as f:
+            with open(os.path.join(staging_dir, 'model_config.json'), 'w') as f:
                 json.dump(config, f)
+            
+            # Running analyzers pick up the new version between requests
+            registry = ModelRegistry()
+            version = registry.publish(
+                [os.path.join(staging_dir, name) for name in
+                 ('rf_classifier.pkl', 'tfidf_vectorizer.pkl', 'label_encoder.pkl', 'model_config.json')],
+                activate=True,
+                metadata={'accuracy': float(accuracy)}
+            )
+            shutil.rmtree(staging_dir, ignore_errors=True)
                 
-            print("\nTraining completed! Model saved.")
+            print(f"\nTraining completed! Model published as version {version} in {registry.root}")
             print("You can now use 'predict_section_rf()' for predictions.")
             
             # Define simple prediction function
             def predict_section_rf(text):
-                processed_text = preprocess_text(text)
+                processed_text = normalize(text)
                 features = vectorizer.transform([processed_text]).toarray()
                 prediction = clf.predict(features)[0]
                 proba = clf.predict_proba(features)[0]
@@ -8,30 +8,270 @@ A simple command-line tool for analyzing legal cases using the PINGGG legal mode
 import requests
 import argparse
 import json
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-def analyze_case(query):
-    """Send a query to the Ollama API running the PINGGG legal model"""
+from ollama_client import OllamaClient, OllamaError
+from response_cache import ResponseCache, DEFAULT_CACHE_DIR
+from response_parser import StreamingResponseParser, FIELDS
+from session import ChatSession, format_turn_stats, DEFAULT_KEEP_ALIVE, DEFAULT_CONTEXT_BUDGET
+
+_client = None
+_cache = None
+_semantic_cache = None
+_retrieval = None
+
+def configure_retrieval(enabled=True, token_budget=None, top_cases=None):
+    """Turn retrieval-augmented prompts on or off; loads the context index once"""
+    global _retrieval
+    if enabled:
+        import prompt_builder
+        prompt_builder.get_index()
+        _retrieval = {
+            "token_budget": token_budget or prompt_builder.DEFAULT_TOKEN_BUDGET,
+            "top_cases": top_cases or prompt_builder.DEFAULT_TOP_CASES
+        }
+    else:
+        _retrieval = None
+
+def prepare_prompt(query):
+    """The query with retrieved IPC definitions and similar cases in front, when retrieval is on"""
+    if _retrieval is None:
+        return query
+    from prompt_builder import build_prompt
+    prompt, _ = build_prompt(query, token_budget=_retrieval["token_budget"], top_cases=_retrieval["top_cases"])
+    return prompt
+
+def configure_semantic_cache(enabled=True, threshold=None):
+    """Set up (or disable) the near-duplicate query cache in front of the model
+
+    Raises RuntimeError when sentence-transformers is not available.
+    """
+    global _semantic_cache
+    if enabled:
+        from semantic_cache import SemanticCache
+        _semantic_cache = SemanticCache(threshold=threshold)
+    else:
+        _semantic_cache = None
+
+def semantic_cache_note(hit):
+    """Header marking an answer reused from a similar earlier query"""
+    return (f"[Cached analysis of a similar query: \"{hit['matched_query']}\" "
+            f"(similarity {hit['similarity']:.2f})]\n\n")
+
+def configure_cache(enabled=True, cache_dir=DEFAULT_CACHE_DIR):
+    """Set up (or disable) the on-disk response cache used by the shared client"""
+    global _cache, _client
+    _cache = ResponseCache(cache_dir) if enabled else None
+    _client = None
+
+def get_client(pool_size=None):
+    """Shared pooled, retrying Ollama client for this process"""
+    global _client
+    if _client is None or (pool_size and pool_size > _client.pool_size):
+        _client = OllamaClient(cache=_cache, pool_size=pool_size or 10)
+    return _client
+
+def format_cache_stats(stats):
+    """One-line summary of response cache activity"""
+    return (f"[cache: {stats['hits']} hits / {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['coalesced']} coalesced, "
+            f"{stats['entries']} entries, {stats['bytes'] / 1024:.1f} KB]")
+
+def connection_error_message(error):
+    return f"Error connecting to Ollama API: {str(error)}\nMake sure Ollama is running on your machine."
+
+def warmup_model(keep_alive=DEFAULT_KEEP_ALIVE):
+    """Load the model before the first query so it does not pay the load time"""
+    start = time.perf_counter()
     try:
-        response = requests.post(
-            'http://localhost:11434/api/generate',
-            json={
-                'model': 'pinggg-legal',
-                'prompt': query
-            },
-            timeout=120  # Increased timeout for longer responses
-        )
-        
-        if response.status_code != 200:
-            return f"Error: API returned status code {response.status_code}\n{response.text}"
-        
-        return response.json().get('response', 'No response received')
+        get_client().load_model(keep_alive=keep_alive)
+        print(f"Model loaded in {time.perf_counter() - start:.1f} s (kept loaded for {keep_alive})")
+    except (OllamaError, requests.exceptions.RequestException) as e:
+        print(f"Warmup failed, continuing without it: {str(e).splitlines()[0]}")
+
+def analyze_case(query, session=None):
+    """Send a query to the Ollama API running the PINGGG legal model
+
+    With a session, the conversation context from earlier turns is sent along
+    and updated from the answer.
+    """
+    vector = None
+    if _semantic_cache is not None and session is None:
+        vector = _semantic_cache.embed(query)
+        hit = _semantic_cache.lookup(query, vector)
+        if hit:
+            return semantic_cache_note(hit) + hit["result"]
+    
+    try:
+        extra = session.request_options() if session is not None else {}
+        result = get_client().generate(prepare_prompt(query), **extra)
+        response = result.get('response', 'No response received')
+        if session is not None:
+            session.record(result)
+        elif _semantic_cache is not None and result.get('response'):
+            _semantic_cache.add(query, response, vector)
+        return response
+    
+    except OllamaError as e:
+        return f"Error: {str(e)}"
+    
+    except requests.exceptions.RequestException as e:
+        return connection_error_message(e)
+
+def print_token(token):
+    """Print a streamed token as soon as it arrives"""
+    print(token, end='', flush=True)
+
+def analyze_case_stream(query, on_token=print_token, session=None):
+    """Stream a query's answer token by token from the Ollama API
+
+    Returns the assembled response text and timing metrics: time to first
+    token, total latency and generation speed in tokens per second. With a
+    session, context is carried over as in analyze_case.
+    """
+    start = time.perf_counter()
+    first_token_at = None
+    chunks = []
+    final = {}
+    
+    vector = None
+    if _semantic_cache is not None and session is None:
+        vector = _semantic_cache.embed(query)
+        hit = _semantic_cache.lookup(query, vector)
+        if hit:
+            response = semantic_cache_note(hit) + hit["result"]
+            if on_token:
+                on_token(response)
+            return {"response": response, "metrics": {
+                "time_to_first_token_ms": (time.perf_counter() - start) * 1000,
+                "total_latency_ms": (time.perf_counter() - start) * 1000,
+                "tokens": 0,
+                "tokens_per_second": None,
+                "cached": True
+            }}
+    
+    extra = session.request_options() if session is not None else {}
+    try:
+        for chunk in get_client().generate_stream(prepare_prompt(query), **extra):
+            token = chunk.get('response', '')
+            if token:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                chunks.append(token)
+                if on_token:
+                    on_token(token)
+            
+            if chunk.get('done'):
+                final = chunk
+    
+    except OllamaError as e:
+        if not chunks:
+            return {"response": f"Error: {str(e)}", "metrics": None}
+        chunks.append(f"\nError from Ollama: {str(e)}")
+        final = None
+    
+    except requests.exceptions.RequestException as e:
+        return {"response": connection_error_message(e), "metrics": None}
+    
+    if final is None:
+        final = {}
+    elif session is not None:
+        session.record(final)
+    elif _semantic_cache is not None and chunks:
+        _semantic_cache.add(query, ''.join(chunks), vector)
+    
+    end = time.perf_counter()
+    metrics = {
+        "time_to_first_token_ms": (first_token_at - start) * 1000 if first_token_at else None,
+        "total_latency_ms": (end - start) * 1000,
+        "tokens": final.get('eval_count', len(chunks)),
+        "tokens_per_second": None,
+        "cached": bool(final.get('cached'))
+    }
+    # Prefer Ollama's own eval timing; fall back to wall clock after the first token
+    if metrics["cached"]:
+        pass  # Answered from the response cache, nothing was generated
+    elif final.get('eval_count') and final.get('eval_duration'):
+        metrics["tokens_per_second"] = final['eval_count'] / (final['eval_duration'] / 1e9)
+    elif first_token_at and end > first_token_at:
+        metrics["tokens_per_second"] = len(chunks) / (end - first_token_at)
+    
+    return {"response": ''.join(chunks), "metrics": metrics}
+
+def analyze_case_fields(query, fields=('section', 'confidence'), on_token=None):
+    """Stream a query's answer only until the requested fields have been parsed
+
+    Closing the stream as soon as the fields are complete makes Ollama stop
+    generating, so asking for just the section number does not wait for the
+    similar cases and recommendations to be written.
+    """
+    start = time.perf_counter()
+    parser = StreamingResponseParser()
+    stopped_early = False
+    tokens = 0
+    error = None
+    
+    stream = get_client().generate_stream(prepare_prompt(query))
+    try:
+        for chunk in stream:
+            token = chunk.get('response', '')
+            if token:
+                tokens += 1
+                parser.feed(token)
+                if on_token:
+                    on_token(token)
+            if parser.is_complete(fields) and not chunk.get('done'):
+                stopped_early = True
+                break
+    
+    except OllamaError as e:
+        error = f"Error: {str(e)}"
     
     except requests.exceptions.RequestException as e:
-        return f"Error connecting to Ollama API: {str(e)}\nMake sure Ollama is running on your machine."
+        error = connection_error_message(e)
+    
+    finally:
+        stream.close()  # Drops the connection, which cancels the generation
+    
+    if not stopped_early:
+        parser.finish()
+    result = parser.result.to_dict()
+    return {
+        "fields": {field: result[field] for field in fields},
+        "analysis": result,
+        "complete": parser.is_complete(fields),
+        "stopped_early": stopped_early,
+        "error": error,
+        "metrics": {
+            "total_latency_ms": (time.perf_counter() - start) * 1000,
+            "tokens": tokens
+        }
+    }
+
+def format_metrics(metrics):
+    """One-line summary of streaming metrics"""
+    if not metrics:
+        return ""
+    parts = []
+    if metrics.get("cached"):
+        parts.append("cached")
+    if metrics["time_to_first_token_ms"] is not None:
+        parts.append(f"first token: {metrics['time_to_first_token_ms']:.0f} ms")
+    if metrics["tokens_per_second"] is not None:
+        parts.append(f"{metrics['tokens_per_second']:.1f} tokens/s")
+    parts.append(f"{metrics['tokens']} tokens")
+    parts.append(f"total: {metrics['total_latency_ms'] / 1000:.1f} s")
+    return "[" + " | ".join(parts) + "]"
+
+def interactive_mode(stream=False, session=None):
+    """Run the analyzer in interactive mode
 
-def interactive_mode():
-    """Run the analyzer in interactive mode"""
+    With a session, follow-up questions see the earlier turns and the system
+    prompt is not evaluated again on every turn.
+    """
     print("\n===== PINGGG Legal Analyzer =====")
     print("Type 'exit' or 'quit' to end the session")
     print("Type your legal query and press Enter")
@@ -42,13 +282,33 @@ def interactive_mode():
             user_input = input("Query: ")
             
             if user_input.lower() in ['exit', 'quit']:
+                if _cache is not None:
+                    print(format_cache_stats(_cache.stats()))
+                if _semantic_cache is not None:
+                    stats = _semantic_cache.stats()
+                    print(f"[semantic cache: {stats['hits']} hits / {stats['misses']} misses "
+                          f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries]")
+                if session is not None and session.turns:
+                    totals = session.summary()
+                    print(f"[session: {totals['turns']} turns | {totals['reused_tokens']} prompt tokens reused | "
+                          f"{totals['prompt_eval_tokens']} evaluated | {totals['dropped_turns']} turns dropped from context]")
                 print("Goodbye!")
                 break
             
             if user_input.strip():
                 print("\nAnalyzing...\n")
-                result = analyze_case(user_input)
-                print(result)
+                turns_before = len(session.turns) if session is not None else 0
+                if stream:
+                    result = analyze_case_stream(user_input, session=session)
+                    if result["metrics"]:
+                        print("\n\n" + format_metrics(result["metrics"]))
+                    else:
+                        print(result["response"])
+                else:
+                    result = analyze_case(user_input, session=session)
+                    print(result)
+                if session is not None and len(session.turns) > turns_before:
+                    print(format_turn_stats(session.turns[-1]))
                 print("\n" + "-" * 80 + "\n")
         
         except KeyboardInterrupt:
@@ -58,31 +318,234 @@ def interactive_mode():
         except Exception as e:
             print(f"Error: {str(e)}")
 
+def read_batch_items(stream):
+    """Yield (id, query) pairs from JSON Lines; plain-text lines are queries too
+
+    JSON objects may carry the query as "query", "prompt" or "text". Items
+    without an "id" are numbered by line.
+    """
+    for line_num, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            item = line
+        if isinstance(item, dict):
+            query = item.get('query') or item.get('prompt') or item.get('text')
+            item_id = item.get('id', line_num)
+        else:
+            query = str(item)
+            item_id = line_num
+        yield item_id, query
+
+def completed_ids(output_path):
+    """Ids already answered without error in an existing results file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partially written last line from an interrupted run
+            if record.get('error') is None:
+                done.add(record.get('id'))
+    return done
+
+def analyze_batch_item(client, item_id, query):
+    """Analyze one batch item, capturing latency and any error in the record"""
+    start = time.perf_counter()
+    record = {"id": item_id, "query": query, "result": None, "error": None}
+    try:
+        if not query:
+            raise ValueError("No query text in input item")
+        record["result"] = client.generate(prepare_prompt(query)).get('response', '')
+    except (OllamaError, ValueError, requests.exceptions.RequestException) as e:
+        record["error"] = str(e)
+    record["latency_ms"] = (time.perf_counter() - start) * 1000
+    return record
+
+def run_batch(items, out, concurrency=4, ordered=True, skip_ids=None, client=None):
+    """Analyze items with up to `concurrency` requests in flight, writing JSONL records
+
+    In ordered mode results are written in input order; finished results wait
+    in a buffer that is capped so a single slow item cannot grow it unbounded.
+    Returns counts of written, failed and skipped items.
+    """
+    if client is None:
+        client = get_client(pool_size=concurrency)
+    skip_ids = skip_ids or set()
+    buffer_limit = concurrency * 4
+    
+    stats = {"written": 0, "errors": 0, "skipped": 0}
+    pending = {}
+    buffered = {}
+    next_seq = 0
+    
+    def write(record):
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+        stats["written"] += 1
+        if record["error"] is not None:
+            stats["errors"] += 1
+    
+    def collect(done_futures):
+        nonlocal next_seq
+        for future in done_futures:
+            seq = pending.pop(future)
+            record = future.result()
+            if not ordered:
+                write(record)
+                continue
+            buffered[seq] = record
+            while next_seq in buffered:
+                write(buffered.pop(next_seq))
+                next_seq += 1
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        seq = 0
+        for item_id, query in items:
+            if item_id in skip_ids:
+                stats["skipped"] += 1
+                continue
+            while len(pending) >= concurrency or len(buffered) >= buffer_limit:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(analyze_batch_item, client, item_id, query)] = seq
+            seq += 1
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    
+    return stats
+
+def batch_mode(input_path, output_path, concurrency=4, ordered=True, resume=False):
+    """Run the analyzer over a JSONL file (or stdin with '-') and write JSONL results"""
+    skip_ids = completed_ids(output_path) if resume and output_path else set()
+    
+    source = sys.stdin if input_path == '-' else open(input_path, 'r', encoding='utf-8')
+    if output_path:
+        out = open(output_path, 'a' if resume else 'w', encoding='utf-8')
+    else:
+        out = sys.stdout
+    
+    start = time.perf_counter()
+    try:
+        stats = run_batch(read_batch_items(source), out, concurrency=concurrency,
+                          ordered=ordered, skip_ids=skip_ids)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    
+    print(f"Processed {stats['written']} queries ({stats['errors']} errors, "
+          f"{stats['skipped']} already completed) in {elapsed:.1f} s", file=sys.stderr)
+    if _cache is not None:
+        print(format_cache_stats(_cache.stats()), file=sys.stderr)
+    return stats
+
 def main():
     """Main function with argument parsing"""
     parser = argparse.ArgumentParser(description="PINGGG Legal Analyzer")
     parser.add_argument("--query", type=str, help="The legal query to analyze")
-    parser.add_argument("--output", type=str, help="Output file to save the analysis (JSON format)")
+    parser.add_argument("--output", type=str, help="Output file to save the analysis (JSON format, or JSONL with --input)")
+    parser.add_argument("--stream", action="store_true", help="Print the answer token by token as it is generated")
+    parser.add_argument("--input", type=str, help="JSONL file of queries to analyze in batch ('-' for stdin)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests kept in flight in batch mode")
+    parser.add_argument("--completion-order", action="store_true", help="Write batch results as they finish instead of in input order")
+    parser.add_argument("--resume", action="store_true", help="Skip ids already completed in the batch output file")
+    parser.add_argument("--no-cache", action="store_true", help="Always regenerate instead of reusing cached answers")
+    parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory for the response cache")
+    parser.add_argument("--semantic-cache", action="store_true", help="Reuse answers of earlier queries that are paraphrases of the new one")
+    parser.add_argument("--semantic-threshold", type=float, help="Similarity needed for a semantic cache hit (0-1)")
+    parser.add_argument("--fields", type=str, help=f"Comma-separated fields to extract, stopping generation once they are complete ({', '.join(FIELDS)})")
+    parser.add_argument("--no-context", action="store_true", help="In interactive mode, send each query independently instead of continuing the conversation")
+    parser.add_argument("--keep-alive", type=str, default=DEFAULT_KEEP_ALIVE, help="How long Ollama keeps the model loaded between interactive queries")
+    parser.add_argument("--context-budget", type=int, default=DEFAULT_CONTEXT_BUDGET, help="Maximum conversation context carried between turns, in tokens")
+    parser.add_argument("--no-warmup", action="store_true", help="Do not load the model before the first interactive query")
+    parser.add_argument("--retrieve", action="store_true", help="Put locally retrieved IPC definitions and similar cases in the prompt")
+    parser.add_argument("--context-tokens", type=int, help="Token budget for retrieved context (default 1200)")
     args = parser.parse_args()
     
-    if args.query:
+    fields = None
+    if args.fields:
+        fields = [field.strip() for field in args.fields.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in FIELDS]
+        if unknown:
+            parser.error(f"unknown field(s) {', '.join(unknown)}; choose from {', '.join(FIELDS)}")
+        if not args.query:
+            parser.error("--fields requires --query")
+    
+    configure_cache(enabled=not args.no_cache, cache_dir=args.cache_dir)
+    try:
+        configure_semantic_cache(enabled=args.semantic_cache, threshold=args.semantic_threshold)
+    except RuntimeError as e:
+        parser.error(f"--semantic-cache: {e}")
+    configure_retrieval(enabled=args.retrieve, token_budget=args.context_tokens)
+    
+    if args.input:
+        batch_mode(args.input, args.output, concurrency=args.concurrency,
+                   ordered=not args.completion_order, resume=args.resume)
+    
+    elif args.query:
         # Run with the provided query
         print("Analyzing...\n")
-        result = analyze_case(args.query)
-        print(result)
+        metrics = None
+        if fields:
+            extracted = analyze_case_fields(args.query, fields, on_token=print_token if args.stream else None)
+            if args.stream:
+                print("\n")
+            if extracted["error"]:
+                print(extracted["error"])
+            for field, value in extracted["fields"].items():
+                print(f"{field}: {json.dumps(value, ensure_ascii=False)}")
+            status = "stopped early" if extracted["stopped_early"] else "full answer"
+            print(f"\n[{status} | {extracted['metrics']['tokens']} tokens | "
+                  f"total: {extracted['metrics']['total_latency_ms'] / 1000:.1f} s]")
+            result = extracted["fields"]
+            metrics = extracted["metrics"]
+        elif args.stream:
+            streamed = analyze_case_stream(args.query)
+            result = streamed["response"]
+            metrics = streamed["metrics"]
+            if metrics:
+                print("\n\n" + format_metrics(metrics))
+            else:
+                print(result)
+        else:
+            result = analyze_case(args.query)
+            print(result)
         
         # Save to output file if specified
         if args.output:
             try:
+                output = {"query": args.query, "result": result}
+                if metrics:
+                    output["metrics"] = metrics
                 with open(args.output, 'w') as f:
-                    json.dump({"query": args.query, "result": result}, f, indent=2)
+                    json.dump(output, f, indent=2)
                 print(f"\nAnalysis saved to {args.output}")
             except Exception as e:
                 print(f"Error saving to file: {str(e)}")
     
     else:
         # Run in interactive mode
-        interactive_mode()
+        if not args.no_warmup:
+            warmup_model(keep_alive=args.keep_alive)
+        session = None
+        if not args.no_context:
+            session = ChatSession(keep_alive=args.keep_alive, context_budget=args.context_budget)
+            if _semantic_cache is not None:
+                # A cached answer does not know the earlier turns a follow-up refers to
+                print("Warning: --semantic-cache is not used while the conversation is continued; "
+                      "add --no-context to use it", file=sys.stderr)
+        interactive_mode(stream=args.stream, session=session)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""
+Load generator for the PINGGG legal model client
+
+Drives ollama_client.OllamaClient (the client legal_analyzer uses) at a fixed
+concurrency, optionally paced to a target request rate, and reports latency
+percentiles, time to first token and throughput. Point it at mock_ollama.py
+to tune concurrency, retries and timeouts without a real Ollama.
+
+Usage:
+    python load_test.py --mock --requests 200 --concurrency 8 --mock-tokens 50
+    python load_test.py --mock --mock-parallel 2 --mock-error-rate 0.05 --mock-stall-rate 0.02 --timeout 5
+    python load_test.py --url http://localhost:11434 --requests 100 --qps 2 --stream
+"""
+
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ollama_client import OllamaClient, DEFAULT_BASE_URL, DEFAULT_MAX_RETRIES, DEFAULT_TIMEOUT
+
+DEFAULT_QUERIES = [
+    "What is IPC Section 302?",
+    "A person committed theft of goods worth Rs. 10,000 from a shop",
+    "Employer failed to pay minimum wages",
+    "If person A tries to kill Person B and person B kills Person A in self defense, is Person B guilty?"
+]
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def run_request(client, query, stream, scheduled_at):
+    """Send one request; latency is measured from its scheduled start"""
+    first_token_at = None
+    error = None
+    try:
+        if stream:
+            for chunk in client.generate_stream(query):
+                if first_token_at is None and chunk.get('response'):
+                    first_token_at = time.perf_counter()
+        else:
+            client.generate(query)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}".splitlines()[0]
+    end = time.perf_counter()
+    return {
+        "latency_ms": (end - scheduled_at) * 1000,
+        "time_to_first_token_ms": (first_token_at - scheduled_at) * 1000 if first_token_at else None,
+        "error": error
+    }
+
+def run_load(client, queries, total_requests, concurrency, qps=None, stream=False):
+    """Issue total_requests requests and return (per-request results, wall time in seconds)
+
+    Without qps, each of the concurrency workers sends its next request as soon
+    as the previous one finishes. With qps, requests are scheduled at a fixed
+    rate and latency includes any time spent waiting for a free worker, so an
+    overloaded client shows up in the percentiles.
+    """
+    results = [None] * total_requests
+    start = time.perf_counter()
+    next_index = [0]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                index = next_index[0]
+                if index >= total_requests:
+                    return
+                next_index[0] += 1
+            if qps:
+                scheduled_at = start + index / qps
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                scheduled_at = time.perf_counter()
+            results[index] = run_request(client, queries[index % len(queries)], stream, scheduled_at)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    return results, time.perf_counter() - start
+
+def summarize(results, elapsed, retries=0):
+    """Latency percentiles, time to first token and throughput of a run"""
+    latencies = sorted(r["latency_ms"] for r in results if r["error"] is None)
+    first_tokens = sorted(r["time_to_first_token_ms"] for r in results
+                          if r["error"] is None and r["time_to_first_token_ms"] is not None)
+    errors = {}
+    for r in results:
+        if r["error"] is not None:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+
+    summary = {
+        "requests": len(results),
+        "succeeded": len(latencies),
+        "failed": len(results) - len(latencies),
+        "retries": retries,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {f"p{p}": percentile(latencies, p) for p in (50, 95, 99)},
+        "errors": errors
+    }
+    if latencies:
+        summary["latency_ms"]["max"] = latencies[-1]
+    if first_tokens:
+        summary["time_to_first_token_ms"] = {f"p{p}": percentile(first_tokens, p) for p in (50, 95, 99)}
+    return summary
+
+def format_summary(summary):
+    def fmt(values):
+        return " | ".join(f"{name} {value:.0f} ms" for name, value in values.items() if value is not None)
+
+    lines = [
+        f"Requests:   {summary['requests']} ({summary['succeeded']} ok, {summary['failed']} failed, "
+        f"{summary['retries']} retries)",
+        f"Elapsed:    {summary['elapsed_s']:.2f} s",
+        f"Throughput: {summary['throughput_rps']:.2f} req/s",
+        f"Latency:    {fmt(summary['latency_ms'])}"
+    ]
+    if "time_to_first_token_ms" in summary:
+        lines.append(f"First token: {fmt(summary['time_to_first_token_ms'])}")
+    for error, count in sorted(summary["errors"].items(), key=lambda item: -item[1]):
+        lines.append(f"  {count} x {error}")
+    return "\n".join(lines)
+
+def load_queries(path):
+    """One query per line, as plain text or JSON objects with a 'query' field"""
+    from legal_analyzer import read_batch_items
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        return [query for _, query in read_batch_items(stream)]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Ollama client used by legal_analyzer")
+    parser.add_argument("--url", type=str, default=DEFAULT_BASE_URL, help="Ollama base URL")
+    parser.add_argument("--mock", action="store_true", help="Start an in-process mock_ollama server and test against it")
+    parser.add_argument("--requests", type=int, default=100, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight at once")
+    parser.add_argument("--qps", type=float, help="Target request rate; default is as fast as the workers allow")
+    parser.add_argument("--stream", action="store_true", help="Use streaming requests and report time to first token")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Client timeout in seconds")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES, help="Client retries per request")
+    parser.add_argument("--input", type=str, help="File with queries to cycle through (same format as batch mode)")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    mock = parser.add_argument_group("mock server (with --mock)")
+    mock.add_argument("--mock-parallel", type=int, help="Generations the mock serves at once (default: --concurrency)")
+    mock.add_argument("--mock-first-token-ms", type=float, default=200, help="Delay before the first token")
+    mock.add_argument("--mock-tokens-per-second", type=float, default=40.0, help="Generation speed after the first token")
+    mock.add_argument("--mock-tokens", type=int, help="Tokens per answer (default: the whole canned answer)")
+    mock.add_argument("--mock-error-rate", type=float, default=0.0, help="Fraction of requests answered with --mock-error-status")
+    mock.add_argument("--mock-error-status", type=int, default=503, help="HTTP status for injected errors")
+    mock.add_argument("--mock-stall-rate", type=float, default=0.0, help="Fraction of requests delayed by --mock-stall-ms")
+    mock.add_argument("--mock-stall-ms", type=float, default=30000, help="Extra delay for stalled requests")
+    mock.add_argument("--mock-seed", type=int, help="Random seed for error and stall injection")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if args.mock:
+        from mock_ollama import MockSettings, start_in_thread
+        settings = MockSettings(
+            first_token_ms=args.mock_first_token_ms, tokens_per_second=args.mock_tokens_per_second,
+            tokens=args.mock_tokens, parallel=args.mock_parallel or args.concurrency,
+            error_rate=args.mock_error_rate, error_status=args.mock_error_status,
+            stall_rate=args.mock_stall_rate, stall_ms=args.mock_stall_ms, seed=args.mock_seed
+        )
+        server, url = start_in_thread(settings)
+
+    queries = load_queries(args.input) if args.input else DEFAULT_QUERIES
+    client = OllamaClient(base_url=url, timeout=args.timeout, max_retries=args.max_retries,
+                          pool_size=args.concurrency)
+    try:
+        results, elapsed = run_load(client, queries, args.requests, args.concurrency,
+                                    qps=args.qps, stream=args.stream)
+    finally:
+        client.close()
+        if server is not None:
+            server.shutdown()
+
+    summary = summarize(results, elapsed, retries=client.retries)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(format_summary(summary))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Local stand-in for the Ollama server
+
+Implements /api/generate (streaming and non-streaming) with a configurable
+first-token delay, token rate, number of parallel generations and error
+injection, so legal_analyzer and its client can be benchmarked and tested
+without Ollama or the Llama-3-8B model.
+
+Usage:
+    python mock_ollama.py --port 11434 --first-token-ms 300 --tokens-per-second 30
+    python mock_ollama.py --error-rate 0.05 --stall-rate 0.01 --stall-ms 30000
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 11434
+
+# Follows the answer layout the Modelfile asks for
+CANNED_ANSWER = """1. Case Description:
+The accused dishonestly took a mobile phone out of the complainant's possession without consent.
+
+2. Legal Analysis:
+--------------------------------------------------
+Applicable IPC Section: 379 (Confidence: 90%)
+
+Section 379 punishes theft as defined in Section 378: moving movable property out of another's possession without consent and with dishonest intention.
+Punishment: imprisonment of either description for up to three years, or fine, or both.
+
+3. Detailed Analysis:
+1. The phone is movable property in the possession of the complainant.
+2. It was taken without consent and with dishonest intention.
+
+4. Similar Cases:
+1. Pyare Lal Bhargava v. State of Rajasthan, AIR 1963 SC 1094
+4. FINAL VERDICT: GUILTY, conviction for theft upheld by the Supreme Court
+
+5. Recommendations:
+- File an FIR at the nearest police station
+- Preserve the purchase invoice and IMEI number
+- Ask the service provider to block the IMEI
+"""
+
+def parse_keep_alive(value):
+    """Seconds for an Ollama keep_alive value ('30m', '1h', 300, -1 for forever); default 5 minutes"""
+    if value is None:
+        return 300.0
+    if isinstance(value, (int, float)):
+        return float('inf') if value < 0 else float(value)
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)(ms|s|m|h)?", str(value).strip())
+    if not match:
+        return 300.0
+    amount = float(match.group(1))
+    if amount < 0:
+        return float('inf')
+    return amount * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, None: 1}[match.group(2)]
+
+class MockSettings:
+    """Behaviour of the mock server, shared by all request handlers"""
+
+    def __init__(self, first_token_ms=200, tokens_per_second=40.0, tokens=None, parallel=1,
+                 error_rate=0.0, error_status=503, stall_rate=0.0, stall_ms=30000, seed=None,
+                 system_tokens=500, prompt_eval_tokens_per_second=0.0, load_ms=0.0):
+        self.first_token_ms = first_token_ms
+        self.system_tokens = system_tokens
+        self.prompt_eval_tokens_per_second = prompt_eval_tokens_per_second
+        self.load_ms = load_ms
+        self.loaded_until = None  # Monotonic time the model stays loaded until; None if not loaded
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+        self.random = random.Random(seed)
+        self.slots = threading.BoundedSemaphore(parallel)  # Ollama runs a limited number of generations at once
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    def answer_tokens(self):
+        """The canned answer split into word tokens, repeated or cut to self.tokens if set"""
+        words = re.findall(r"\S+\s*", CANNED_ANSWER)
+        count = self.tokens if self.tokens is not None else len(words)
+        return [words[i % len(words)] for i in range(count)]
+
+    def ensure_loaded(self, keep_alive):
+        """Sleep for the load time if the model is not in memory, then extend its keep-alive"""
+        with self.lock:
+            now = time.monotonic()
+            needs_load = self.loaded_until is None or now > self.loaded_until
+            self.loaded_until = now + parse_keep_alive(keep_alive)
+        if needs_load:
+            time.sleep(self.load_ms / 1000)
+        return needs_load
+
+    def draw(self):
+        """Decide the fate of one request: 'error', 'stall' or 'ok'"""
+        with self.lock:
+            self.requests += 1
+            roll = self.random.random()
+            if roll < self.error_rate:
+                self.errors += 1
+                return 'error'
+            if roll < self.error_rate + self.stall_rate:
+                return 'stall'
+            return 'ok'
+
+    def prompt_eval_count(self, payload):
+        """Tokens to evaluate; a passed context is treated as already in the KV cache"""
+        prompt_tokens = len(payload['prompt'].split())
+        if payload.get('context'):
+            return prompt_tokens
+        return self.system_tokens + prompt_tokens
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    settings = None  # Set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def write_chunk(self, body):
+        data = (json.dumps(body) + '\n').encode('utf-8')
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == '/api/version':
+            self.send_json(200, {'version': 'mock'})
+        elif self.path == '/api/tags':
+            self.send_json(200, {'models': [{'name': 'pinggg-legal:latest'}]})
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/api/generate':
+            self.send_json(404, {'error': 'not found'})
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            self.send_json(400, {'error': 'invalid JSON'})
+            return
+        settings = self.settings
+        if not payload.get('prompt'):
+            # Like Ollama, a request without a prompt only loads the model
+            settings.ensure_loaded(payload.get('keep_alive'))
+            self.send_json(200, {'model': payload.get('model', 'pinggg-legal'), 'response': '',
+                                 'done': True, 'done_reason': 'load'})
+            return
+
+        fate = settings.draw()
+        if fate == 'error':
+            self.send_json(settings.error_status, {'error': 'injected failure'})
+            return
+        if fate == 'stall':
+            time.sleep(settings.stall_ms / 1000)
+
+        with settings.slots:
+            settings.ensure_loaded(payload.get('keep_alive'))
+            self.generate(payload)
+
+    def generate(self, payload):
+        settings = self.settings
+        tokens = settings.answer_tokens()
+        token_delay = 1.0 / settings.tokens_per_second if settings.tokens_per_second > 0 else 0.0
+        prompt_tokens = settings.prompt_eval_count(payload)
+        start = time.perf_counter()
+        prompt_delay = settings.first_token_ms / 1000
+        if settings.prompt_eval_tokens_per_second > 0:
+            prompt_delay += prompt_tokens / settings.prompt_eval_tokens_per_second
+        time.sleep(prompt_delay)
+        prompt_done = time.perf_counter()
+
+        context = payload.get('context') or []
+
+        def final_fields():
+            end = time.perf_counter()
+            return {
+                'model': payload.get('model', 'pinggg-legal'),
+                'done': True,
+                'total_duration': int((end - start) * 1e9),
+                'prompt_eval_count': prompt_tokens,
+                'prompt_eval_duration': int((prompt_done - start) * 1e9),
+                'eval_count': len(tokens),
+                'eval_duration': int((end - prompt_done) * 1e9),
+                'context': list(context) + list(range(len(context), len(context) + prompt_tokens + len(tokens)))
+            }
+
+        if payload.get('stream', True):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                for i, token in enumerate(tokens):
+                    if i:
+                        time.sleep(token_delay)
+                    self.write_chunk({'model': payload.get('model', 'pinggg-legal'), 'response': token, 'done': False})
+                self.write_chunk(dict(final_fields(), response=''))
+                self.wfile.write(b'0\r\n\r\n')
+            except (BrokenPipeError, ConnectionResetError):
+                # Client closed the stream; Ollama stops generating at this point too
+                with settings.lock:
+                    settings.cancelled += 1
+        else:
+            time.sleep(token_delay * max(len(tokens) - 1, 0))
+            try:
+                self.send_json(200, dict(final_fields(), response=''.join(tokens)))
+            except (BrokenPipeError, ConnectionResetError):
+                # Client gave up waiting (e.g. a read timeout on a stalled request)
+                with settings.lock:
+                    settings.cancelled += 1
+
+def make_server(settings, host='127.0.0.1', port=DEFAULT_PORT):
+    """Threaded HTTP server bound to host:port; port 0 picks a free port"""
+    handler = type('BoundMockOllamaHandler', (MockOllamaHandler,), {'settings': settings})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def start_in_thread(settings=None, host='127.0.0.1', port=0):
+    """Run a mock server in a background thread and return (server, base_url)"""
+    server = make_server(settings or MockSettings(), host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Ollama /api/generate endpoint")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--first-token-ms", type=float, default=200, help="Delay before the first token (prompt evaluation)")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="Generation speed after the first token")
+    parser.add_argument("--tokens", type=int, help="Tokens per answer (default: the whole canned answer)")
+    parser.add_argument("--parallel", type=int, default=1, help="Generations served at once; others queue (like OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status for injected errors")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Fraction of requests delayed by --stall-ms before generating")
+    parser.add_argument("--stall-ms", type=float, default=30000, help="Extra delay for stalled requests")
+    parser.add_argument("--seed", type=int, help="Random seed for error and stall injection")
+    parser.add_argument("--system-tokens", type=int, default=500, help="Simulated system prompt length, evaluated on requests without context")
+    parser.add_argument("--prompt-eval-tokens-per-second", type=float, default=0.0, help="Prompt evaluation speed added to the first-token delay (0 to disable)")
+    parser.add_argument("--load-ms", type=float, default=0.0, help="Model load time when the model is not loaded (first request or keep_alive expired)")
+    args = parser.parse_args()
+
+    settings = MockSettings(first_token_ms=args.first_token_ms, tokens_per_second=args.tokens_per_second,
+                            tokens=args.tokens, parallel=args.parallel, error_rate=args.error_rate,
+                            error_status=args.error_status, stall_rate=args.stall_rate,
+                            stall_ms=args.stall_ms, seed=args.seed, system_tokens=args.system_tokens,
+                            prompt_eval_tokens_per_second=args.prompt_eval_tokens_per_second,
+                            load_ms=args.load_ms)
+    server = make_server(settings, args.host, args.port)
+    print(f"Mock Ollama listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {settings.requests} requests ({settings.errors} injected errors, "
+              f"{settings.cancelled} streams cancelled by the client)")
+
+if __name__ == "__main__":
+    main()
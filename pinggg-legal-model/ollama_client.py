@@ -0,0 +1,211 @@
+"""
+Ollama client for the PINGGG legal model
+
+A pooled, retrying HTTP client for Ollama's /api/generate endpoint, plus an
+asyncio front end that keeps many requests in flight at once.
+"""
+
+import asyncio
+import functools
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from response_cache import cache_key
+
+DEFAULT_BASE_URL = 'http://localhost:11434'
+DEFAULT_MODEL = 'pinggg-legal'
+DEFAULT_TIMEOUT = 120  # Seconds; long structured answers take a while
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 8.0
+DEFAULT_POOL_SIZE = 10
+
+RETRY_STATUS_CODES = {500, 502, 503, 504}
+
+class OllamaError(Exception):
+    """Ollama answered with an error status or an error message"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class OllamaClient:
+    """Keep-alive connection pool with bounded, jittered retries
+
+    Connection errors, connect timeouts and 5xx responses are retried up to
+    max_retries times with "full jitter" exponential backoff. Streams are only
+    retried before the first chunk has been received.
+
+    With a ResponseCache, identical requests are answered from the cache and
+    concurrent identical requests share one generation.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, model=DEFAULT_MODEL, timeout=DEFAULT_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_max=DEFAULT_BACKOFF_MAX, pool_size=DEFAULT_POOL_SIZE, cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.cache = cache
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.retries = 0  # Total retries performed, for monitoring
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def backoff_delay(self, attempt):
+        """Random delay in [0, min(max, base * 2^attempt)]"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def build_payload(self, prompt, stream, options=None, **extra):
+        """Request body for /api/generate; extra keys (context, keep_alive, ...) are passed through"""
+        payload = {'model': self.model, 'prompt': prompt, 'stream': stream}
+        if options:
+            payload['options'] = options
+        payload.update({key: value for key, value in extra.items() if value is not None})
+        return payload
+
+    def post(self, path, payload, stream=False):
+        """POST with retries; returns a response with a 2xx/4xx status"""
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(self.base_url + path, json=payload, stream=stream,
+                                             timeout=self.timeout)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                error = OllamaError(f"API returned status code {response.status_code}\n{response.text}",
+                                    response.status_code)
+                response.close()
+            except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout) as e:
+                error = e
+
+            if attempt >= self.max_retries:
+                raise error
+            time.sleep(self.backoff_delay(attempt))
+            attempt += 1
+            self.retries += 1
+
+    def load_model(self, keep_alive=None):
+        """Load the model into memory without generating anything (a request with no prompt)"""
+        payload = {'model': self.model, 'stream': False}
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+        response = self.post('/api/generate', payload)
+        if response.status_code != 200:
+            raise OllamaError(f"API returned status code {response.status_code}\n{response.text}",
+                              response.status_code)
+        return response.json()
+
+    def generate(self, prompt, options=None, **extra):
+        """Generate a complete answer and return Ollama's final JSON object"""
+        payload = self.build_payload(prompt, False, options, **extra)
+        if self.cache is None:
+            return self._generate(payload)
+        return self.cache.get_or_generate(cache_key(payload), lambda: self._generate(payload))
+
+    def _generate(self, payload):
+        response = self.post('/api/generate', payload)
+        if response.status_code != 200:
+            raise OllamaError(f"API returned status code {response.status_code}\n{response.text}",
+                              response.status_code)
+        result = response.json()
+        if 'error' in result:
+            raise OllamaError(result['error'], response.status_code)
+        return result
+
+    def generate_stream(self, prompt, options=None, **extra):
+        """Yield Ollama's streamed JSON chunks as they arrive; the last one has done=True
+
+        A cached answer is yielded as a single final chunk, and a completed
+        stream is stored in the cache.
+        """
+        payload = self.build_payload(prompt, True, options, **extra)
+        key = None
+        if self.cache is not None:
+            key = cache_key(payload)
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield dict(cached, done=True)
+                return
+
+        tokens = []
+        response = self.post('/api/generate', payload, stream=True)
+        with response:
+            if response.status_code != 200:
+                raise OllamaError(f"API returned status code {response.status_code}\n{response.text}",
+                                  response.status_code)
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if 'error' in chunk:
+                    raise OllamaError(chunk['error'], response.status_code)
+                tokens.append(chunk.get('response', ''))
+                yield chunk
+                if chunk.get('done'):
+                    if key is not None:
+                        self.cache.put(key, dict(chunk, response=''.join(tokens)))
+                    break
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class AsyncOllamaClient:
+    """asyncio front end that keeps up to max_in_flight requests running
+
+    Requests run on a thread pool over one pooled OllamaClient, so awaiting
+    many queries with asyncio.gather drives the server concurrently without
+    another HTTP dependency.
+    """
+
+    def __init__(self, max_in_flight=8, **client_kwargs):
+        client_kwargs.setdefault('pool_size', max_in_flight)
+        self.client = OllamaClient(**client_kwargs)
+        self.max_in_flight = max_in_flight
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._semaphore = None
+
+    async def _run(self, func, *args, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def generate(self, prompt, options=None, **extra):
+        """Awaitable version of OllamaClient.generate"""
+        return await self._run(self.client.generate, prompt, options, **extra)
+
+    async def generate_many(self, prompts, options=None, **extra):
+        """Run many prompts concurrently; failed items come back as exceptions, in input order"""
+        return await asyncio.gather(
+            *(self.generate(prompt, options, **extra) for prompt in prompts),
+            return_exceptions=True
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
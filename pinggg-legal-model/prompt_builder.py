@@ -0,0 +1,393 @@
+"""
+Retrieval-augmented prompts for the PINGGG legal model
+
+The model cannot open the case files the Modelfile mentions, so its
+precedents came from its weights alone. This module retrieves the most
+relevant IPC definitions (ipc_sec_dataset.csv) and judgments (the scraped case
+JSON files) from a precomputed BM25 index, trims them to a token budget and
+puts them in front of the question, with an instruction to cite only the
+retrieved cases. Prompts without retrieval keep the Modelfile's instruction.
+
+This directory is uploaded to Hugging Face on its own (upload_to_hf.py), so the
+module does not import from ../legal_model, whose modules also need
+scikit-learn and case_data. The small pieces it shares with them are copies:
+stem() is keyword_classifier.normalize_token, normalize_section() is
+case_retrieval.normalize_section, the BM25 parameters are case_retrieval's,
+and the boilerplate removal is a sentence-level version of boilerplate.py's
+shingle mask. Change them together.
+
+Usage:
+    python prompt_builder.py "A man stole a mobile phone from a shop"
+    python prompt_builder.py --rebuild
+"""
+
+import argparse
+import csv
+import glob
+import json
+import math
+import os
+import re
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPORT_DIR = os.path.join(BASE_DIR, 'final_export', 'final_export')
+INDEX_PATH = os.path.join(BASE_DIR, 'context.index.json')
+INDEX_VERSION = 1  # Bump when tokenization or the saved layout changes
+
+DEFAULT_TOP_SECTIONS = 3
+DEFAULT_TOP_CASES = 3
+DEFAULT_TOKEN_BUDGET = 1200
+SUMMARY_SENTENCES = 3
+CITATION_RULE = ("Under \"Similar Cases\", cite only the cases listed above under \"Similar cases\"; "
+                 "if none are listed, write \"No similar cases in database\".")
+BOILERPLATE_MIN_DOCS = 2  # Judgments are deduplicated, so shared sentences are site text
+BOILERPLATE_MIN_WORDS = 5
+
+# Judgment ranking: normalized BM25 vs. citing one of the retrieved sections
+LEXICAL_WEIGHT = 0.6
+SECTION_WEIGHT = 0.4
+# A judgment needs this raw BM25 score against the query before it can be offered at all:
+# about one query word found in few judgments, or several common ones. A shared section
+# alone (a theft query and a rape judgment that also cites 378) is not relevance.
+MIN_CASE_SCORE = 2.0
+
+# BM25 parameters, as in legal_model/case_retrieval.py
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+SECTION_LABEL = re.compile(r"(\d+[A-Za-z]?)(?:IPC|CrPC|Cr|etc)?")
+LEADING_DIGITS = re.compile(r"\d+")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+SENTENCE_END = re.compile(r"(?<=[.!?])")
+# Banners indiankanoon.org puts in front of every judgment
+SITE_BANNERS = re.compile(
+    r"(?:Take notes as you read a judgment )?using our\s*Virtual Legal Assistant.*?\(Query Alert Service\)\.\s*"
+    r"|Try out our\s*Premium Member Services.*?for one month\.\s*"
+)
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from had has have he her his in is it its of on or that the "
+    "their them they this to was were which who with".split()
+)
+
+SUFFIXES = ("ing", "ed", "es", "s")
+IRREGULAR_FORMS = {"stole": "steal", "stolen": "steal", "thieves": "thief"}
+
+def stem(word):
+    """Crude stem so inflections match ('raped' and 'rape' -> 'rap'); same as keyword_classifier.normalize_token"""
+    if word in IRREGULAR_FORMS:
+        return IRREGULAR_FORMS[word]
+    for suffix in SUFFIXES:
+        if len(word) - len(suffix) >= 3 and word.endswith(suffix):
+            word = word[:-len(suffix)]
+            break
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+def tokenize(text):
+    return [stem(word) for word in WORD_PATTERN.findall(text.lower()) if word not in STOP_WORDS]
+
+def normalize_section(label):
+    """Section number from a scraped label ('302IPC' -> '302', '166ACr' -> '166A'); same as case_retrieval.normalize_section"""
+    label = str(label).strip()
+    match = SECTION_LABEL.fullmatch(label)
+    if match:
+        return match.group(1).upper()
+    match = LEADING_DIGITS.match(label)
+    return match.group() if match else None
+
+def estimate_tokens(text):
+    """Rough Llama token count (about four characters per token)"""
+    return len(text) // 4 + 1
+
+def find_sources():
+    """(ipc_sec_dataset.csv path, case JSON paths) from this directory, the export or ../legal_model"""
+    candidates = [BASE_DIR, EXPORT_DIR, os.path.join(os.path.dirname(BASE_DIR), 'legal_model')]
+    csv_path = next((os.path.join(d, 'ipc_sec_dataset.csv') for d in candidates
+                     if os.path.exists(os.path.join(d, 'ipc_sec_dataset.csv'))), None)
+    case_paths = []
+    for d in (os.path.join(BASE_DIR, 'data'), os.path.join(EXPORT_DIR, 'data')):
+        case_paths = sorted(glob.glob(os.path.join(d, '*.json')))
+        if case_paths:
+            break
+    return csv_path, case_paths
+
+def source_signature(paths):
+    return [[os.path.basename(p), os.path.getsize(p), int(os.path.getmtime(p))] for p in paths]
+
+def load_section_passages(csv_path):
+    passages = []
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            section = row['Section'].replace('IPC', '').strip()
+            passages.append({
+                'section': section,
+                'offense': row['Offense'],
+                'text': f"{row['Description']}. Punishment: {row['Punishment']}.",
+                'keywords': row['Keywords']
+            })
+    return passages
+
+def load_case_passages(case_paths):
+    """One passage per judgment, deduplicated by doc_id across query files"""
+    passages = []
+    seen = set()
+    for path in case_paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        for record in records:
+            doc_id = record.get('doc_id')
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            sections = []
+            for label in record.get('ipc_sections') or []:
+                section = normalize_section(label)
+                if section and section not in sections:
+                    sections.append(section)
+            passages.append({
+                'doc_id': doc_id,
+                'title': ' '.join((record.get('title') or '').split()),
+                'court': ' '.join((record.get('court') or '').split()),
+                'date': record.get('date'),
+                'sections': sections,
+                'text': SITE_BANNERS.sub('', ' '.join((record.get('summary') or '').split()))
+            })
+
+    # Sentences repeated across many judgments are site boilerplate, not facts
+    # (the scraped text often lacks the space after a full stop, so split right after it)
+    counts = {}
+    for passage in passages:
+        for piece in set(p.strip() for p in SENTENCE_END.split(passage['text'])):
+            counts[piece] = counts.get(piece, 0) + 1
+    limit = max(BOILERPLATE_MIN_DOCS, len(passages) // 10)
+    for passage in passages:
+        kept = [p for p in SENTENCE_END.split(passage['text'])
+                if counts.get(p.strip(), 0) < limit or len(p.split()) < BOILERPLATE_MIN_WORDS]
+        passage['text'] = ''.join(kept).strip()
+    return passages
+
+class Bm25Index:
+    """Compact BM25 index: token -> [[passage, term frequency], ...]"""
+
+    def __init__(self, postings, lengths):
+        self.postings = postings
+        self.lengths = lengths
+        self.avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    @classmethod
+    def build(cls, texts):
+        postings = {}
+        lengths = []
+        for idx, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, []).append([idx, count])
+        return cls(postings, lengths)
+
+    def search(self, query, top_k):
+        """(passage index, score) pairs, best first"""
+        scores = {}
+        count = len(self.lengths)
+        for token in set(tokenize(query)):
+            entries = self.postings.get(token)
+            if not entries:
+                continue
+            idf = math.log(1 + (count - len(entries) + 0.5) / (len(entries) + 0.5))
+            for idx, tf in entries:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[idx] / self.avg_length)
+                scores[idx] = scores.get(idx, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:top_k]
+
+    def to_dict(self):
+        return {'postings': self.postings, 'lengths': self.lengths}
+
+class ContextIndex:
+    """Precomputed retrieval index over IPC definitions and judgments"""
+
+    def __init__(self, sections, cases, section_index, case_index, signature=None):
+        self.sections = sections
+        self.cases = cases
+        self.section_index = section_index
+        self.case_index = case_index
+        self.signature = signature
+
+    @classmethod
+    def build(cls, csv_path=None, case_paths=None):
+        found_csv, found_cases = find_sources()
+        csv_path = csv_path or found_csv
+        case_paths = found_cases if case_paths is None else case_paths
+        sections = load_section_passages(csv_path) if csv_path else []
+        cases = load_case_passages(case_paths)
+        section_index = Bm25Index.build(
+            f"{s['offense']} {s['text']} {s['keywords']}" for s in sections
+        )
+        case_index = Bm25Index.build(f"{c['title']} {c['text']}" for c in cases)
+        signature = source_signature(([csv_path] if csv_path else []) + list(case_paths))
+        return cls(sections, cases, section_index, case_index, signature)
+
+    def save(self, path=INDEX_PATH):
+        data = {
+            'version': INDEX_VERSION,
+            'signature': self.signature,
+            'sections': self.sections,
+            'cases': self.cases,
+            'section_index': self.section_index.to_dict(),
+            'case_index': self.case_index.to_dict()
+        }
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported context index version {data.get('version')}")
+        return cls(
+            data['sections'], data['cases'],
+            Bm25Index(**data['section_index']), Bm25Index(**data['case_index']),
+            data['signature']
+        )
+
+    def retrieve(self, query, top_sections=DEFAULT_TOP_SECTIONS, top_cases=DEFAULT_TOP_CASES):
+        """Best matching IPC definitions and judgments for a query
+
+        Judgments scoring below MIN_CASE_SCORE in BM25 are left out, so an
+        unrelated query gets no cases. The rest are ranked by normalized BM25
+        plus a boost for citing the retrieved sections.
+        """
+        section_hits = self.section_index.search(query, top_sections)
+        sections = [self.sections[idx] for idx, _ in section_hits]
+        best_section = section_hits[0][1] if section_hits else 0.0
+        section_weights = {}
+        for idx, score in section_hits:
+            section = self.sections[idx]['section']
+            section_weights[section] = max(section_weights.get(section, 0.0), score / best_section)
+
+        lexical = dict(self.case_index.search(query, len(self.cases)))
+        best_case = max(lexical.values()) if lexical else 0.0
+        scores = {}
+        for idx, case in enumerate(self.cases):
+            if lexical.get(idx, 0.0) < MIN_CASE_SCORE:
+                continue
+            boost = max((section_weights.get(s, 0.0) for s in case['sections']), default=0.0)
+            score = LEXICAL_WEIGHT * (lexical.get(idx, 0.0) / best_case if best_case else 0.0) + SECTION_WEIGHT * boost
+            if score > 0:
+                scores[idx] = score
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:top_cases]
+        return sections, [self.cases[idx] for idx, _ in ranked]
+
+def load_or_build_index(path=INDEX_PATH, rebuild=False):
+    """Load the saved index, rebuilding it when the source files have changed"""
+    if not rebuild and os.path.exists(path):
+        try:
+            index = ContextIndex.load(path)
+            csv_path, case_paths = find_sources()
+            if index.signature == source_signature(([csv_path] if csv_path else []) + case_paths):
+                return index
+        except (ValueError, KeyError, json.JSONDecodeError):
+            pass
+    index = ContextIndex.build()
+    try:
+        index.save(path)
+    except OSError:
+        pass  # Read-only install: keep the in-memory index
+    return index
+
+def key_sentences(text, query_tokens, limit=SUMMARY_SENTENCES):
+    """The sentences of a summary sharing most words with the query, in their original order
+
+    Sentences sharing no word are never used, so the result may be empty.
+    """
+    sentences = [s for s in SENTENCE_SPLIT.split(text) if s]
+    overlaps = [len(query_tokens.intersection(tokenize(sentence))) for sentence in sentences]
+    scored = sorted((i for i in range(len(sentences)) if overlaps[i]), key=lambda i: (-overlaps[i], i))[:limit]
+    return ' '.join(sentences[i] for i in sorted(scored))
+
+def format_context(query, sections, cases, token_budget=DEFAULT_TOKEN_BUDGET):
+    """Reference block of definitions and case notes plus the citation rule, cut to fit token_budget"""
+    query_tokens = set(tokenize(query))
+    lines = ["Reference material from the local database:"]
+    used = estimate_tokens(lines[0]) + estimate_tokens(CITATION_RULE)
+
+    if sections:
+        lines.append("IPC definitions:")
+        for s in sections:
+            line = f"- Section {s['section']} ({s['offense']}): {s['text']}"
+            cost = estimate_tokens(line)
+            if used + cost > token_budget:
+                break
+            lines.append(line)
+            used += cost
+
+    included = []
+    lines.append("Similar cases:")
+    for case in cases:
+        header = f"[{len(included) + 1}] {case['title']} ({case['court']})"
+        if case['sections']:
+            header += f", IPC sections {', '.join(case['sections'][:8])}"
+        remaining = (token_budget - used - estimate_tokens(header)) * 4
+        if remaining < 80:
+            break
+        summary = key_sentences(case['text'], query_tokens)[:remaining]
+        line = f"{header}: {summary}" if summary else header
+        lines.append(line)
+        used += estimate_tokens(line)
+        included.append(case)
+    if not included:
+        lines.append("No similar cases in database")
+    lines.append(CITATION_RULE)
+
+    return '\n'.join(lines), included, used
+
+_index = None
+
+def get_index():
+    """Load the context index once per process"""
+    global _index
+    if _index is None:
+        _index = load_or_build_index()
+    return _index
+
+def build_prompt(query, token_budget=DEFAULT_TOKEN_BUDGET, top_sections=DEFAULT_TOP_SECTIONS,
+                 top_cases=DEFAULT_TOP_CASES, index=None):
+    """Prompt with retrieved context followed by the question, plus retrieval details"""
+    index = index or get_index()
+    start = time.perf_counter()
+    sections, cases = index.retrieve(query, top_sections, top_cases)
+    retrieve_ms = (time.perf_counter() - start) * 1000
+    context, included, context_tokens = format_context(query, sections, cases, token_budget)
+    prompt = f"{context}\n\nCase / question:\n{query}"
+    return prompt, {
+        'retrieve_ms': retrieve_ms,
+        'sections': [s['section'] for s in sections],
+        'cases': [c['doc_id'] for c in included],
+        'context_tokens': context_tokens
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the retrieval-augmented prompt for a query")
+    parser.add_argument("query", nargs="*", help="Legal query")
+    parser.add_argument("--budget", type=int, default=DEFAULT_TOKEN_BUDGET, help="Token budget for the retrieved context")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the saved index from the source files")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_or_build_index(rebuild=args.rebuild)
+    print(f"Index: {len(index.sections)} IPC definitions, {len(index.cases)} judgments "
+          f"({(time.perf_counter() - start) * 1000:.0f} ms to load)")
+    if args.query:
+        prompt, info = build_prompt(' '.join(args.query), token_budget=args.budget, index=index)
+        print(prompt)
+        print(f"\n[retrieval: {info['retrieve_ms']:.2f} ms | context: ~{info['context_tokens']} tokens]")
+
+if __name__ == "__main__":
+    main()
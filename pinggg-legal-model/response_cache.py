@@ -0,0 +1,165 @@
+"""
+Response cache for the PINGGG legal model
+
+Content-addressed on-disk cache of Ollama answers keyed by a hash of the
+model, prompt and generation parameters, with LRU size limits, a TTL and
+single-flight deduplication of concurrent identical requests.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'PINGGG_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'pinggg-legal')
+)
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+def cache_key(payload):
+    """SHA-256 of the canonical JSON of a request payload, ignoring the stream flag"""
+    fields = {key: value for key, value in payload.items() if key != 'stream'}
+    canonical = json.dumps(fields, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """On-disk LRU cache of generation results
+
+    Entries are JSON files named by their key. Recency is kept in memory (and
+    in file mtimes across restarts); the least recently used entries are
+    evicted once the total size exceeds max_bytes, and entries older than
+    ttl_seconds are treated as misses.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._bytes = 0
+        self._in_flight = {}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_entries()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _load_entries(self):
+        """Rebuild the LRU order from the files already on disk"""
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            found.append((stat.st_mtime, name[:-len('.json')], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+
+    def _remove(self, key):
+        size = self._entries.pop(key, 0)
+        self._bytes -= size
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key):
+        """Cached result for a key (marked cached=True), or None on a miss or an expired entry"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._remove(key)
+                self.misses += 1
+                return None
+            if self.ttl_seconds is not None and time.time() - entry['created'] > self.ttl_seconds:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            os.utime(self._path(key))
+            self.hits += 1
+            return dict(entry['result'], cached=True)
+
+    def put(self, key, result):
+        """Store a result, evicting least recently used entries over the size limit"""
+        data = json.dumps({'created': time.time(), 'result': result}, ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            tmp_path = self._path(key) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+            self._entries[key] = len(data)
+            self._bytes += len(data)
+
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_generate(self, key, generate):
+        """Return the cached result or run generate() once for all concurrent callers of a key"""
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None and key not in self._entries
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            elif future is not None:
+                self.coalesced += 1
+
+        if future is None:
+            # Another caller finished generating between our lookup and taking the lock
+            return self.get(key) or self.get_or_generate(key, generate)
+        if not owner:
+            return dict(future.result(), cached=True)
+
+        try:
+            result = generate()
+            self.put(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stats(self):
+        """Hit rate and size of the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions
+            }
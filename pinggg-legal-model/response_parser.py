@@ -0,0 +1,160 @@
+"""
+Incremental parser for the PINGGG legal model's structured answers
+
+The Modelfile makes the model answer in a fixed layout:
+
+    1. Case Description:
+    2. Legal Analysis:
+       Applicable IPC Section: [N] (Confidence: [P]%)
+    3. [Detailed analysis]
+    4. Similar Cases:
+    5. Recommendations:
+
+StreamingResponseParser fills a LegalAnalysis from tokens as they arrive and
+reports when the fields a caller asked for are complete, so generation can be
+cancelled early.
+"""
+
+import re
+
+FIELDS = ('description', 'section', 'confidence', 'explanation', 'analysis',
+          'similar_cases', 'recommendations')
+
+# Heading number -> field holding that part's text
+PART_FIELDS = {1: 'description', 2: 'explanation', 3: 'analysis', 4: 'similar_cases', 5: 'recommendations'}
+
+HEADING_PATTERN = re.compile(
+    r"^\s*(?:\*\*|#+\s*)?([1-5])\.\s*(Case Description|Legal Analysis|Detailed(?: Legal)? Analysis|"
+    r"Similar Cases|Recommendations)?\b\s*:?\s*(?:\*\*)?\s*:?\s*(.*)$",
+    re.IGNORECASE
+)
+SECTION_PATTERN = re.compile(
+    r"Applicable IPC Section:?\s*(?:Section\s*)?(\d+[A-Z]?)\s*(?:\((?:Confidence:?\s*)?([\d.]+)\s*%\))?",
+    re.IGNORECASE
+)
+RULE_PATTERN = re.compile(r"^\s*[-=_*]{3,}\s*$")
+BULLET_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+\.)\s+(.*)$")
+TITLES = {'case description': 1, 'legal analysis': 2, 'detailed analysis': 3,
+          'detailed legal analysis': 3, 'similar cases': 4, 'recommendations': 5}
+
+class LegalAnalysis:
+    """Fields of a structured answer; text fields are None until their part has started"""
+
+    def __init__(self):
+        self.description = None
+        self.section = None
+        self.confidence = None
+        self.explanation = None
+        self.analysis = None
+        self.similar_cases = None
+        self.recommendations = None
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in FIELDS}
+
+class StreamingResponseParser:
+    """Feed tokens in order; fields become available as soon as their text is complete
+
+    A part's text is complete when the next heading starts (or the stream ends).
+    The section number and confidence are complete as soon as the
+    "Applicable IPC Section" line has been seen.
+    """
+
+    def __init__(self):
+        self.result = LegalAnalysis()
+        self.completed = set()
+        self.text = ''
+        self._pending = ''
+        self._part = 0
+        self._lines = []
+        self._section_line_seen = False
+
+    def feed(self, token):
+        """Add a chunk of text and return the set of fields completed so far"""
+        self.text += token
+        self._pending += token
+        while '\n' in self._pending:
+            line, self._pending = self._pending.split('\n', 1)
+            self._process_line(line)
+        if 'section' not in self.completed and self._part <= 2:
+            # The section line often arrives well before its newline
+            self._match_section(self._pending, final=False)
+        return self.completed
+
+    def finish(self):
+        """Flush the last line at the end of the stream; every started part is then complete"""
+        if self._pending:
+            self._process_line(self._pending)
+            self._pending = ''
+        self._close_part()
+        for field in ('section', 'confidence'):
+            if getattr(self.result, field) is not None:
+                self.completed.add(field)
+        return self.result
+
+    def is_complete(self, fields):
+        return all(field in self.completed for field in fields)
+
+    def _heading(self, line):
+        """Part number if the line starts the next part of the answer, else None"""
+        match = HEADING_PATTERN.match(line)
+        if not match:
+            return None
+        number = int(match.group(1))
+        title = match.group(2)
+        if title:
+            number = TITLES.get(title.lower(), number)
+            return number if number > self._part else None
+        # Untitled "3." is the detailed analysis only right after the legal analysis;
+        # elsewhere numbered lines are list items inside a part
+        if number == 3 and self._part == 2:
+            return 3
+        return None
+
+    def _process_line(self, line):
+        number = self._heading(line)
+        if number is not None:
+            self._close_part()
+            self._part = number
+            self._lines = []
+            line = HEADING_PATTERN.match(line).group(3)
+        if self._part <= 2 and not self._section_line_seen and SECTION_PATTERN.search(line):
+            # Keep the section line out of the explanation text
+            self._section_line_seen = True
+            if 'section' not in self.completed:
+                self._match_section(line, final=True)
+            return
+        if self._part and not RULE_PATTERN.match(line):
+            self._lines.append(line)
+
+    def _match_section(self, line, final):
+        match = SECTION_PATTERN.search(line)
+        if not match or (not final and match.group(2) is None):
+            return False
+        self.result.section = match.group(1).upper()
+        self.completed.add('section')
+        if match.group(2) is not None:
+            self.result.confidence = float(match.group(2))
+            self.completed.add('confidence')
+        return True
+
+    def _close_part(self):
+        if not self._part:
+            return
+        field = PART_FIELDS[self._part]
+        text = '\n'.join(self._lines).strip()
+        if field == 'recommendations':
+            bullets = [m.group(1).strip() for m in map(BULLET_PATTERN.match, self._lines) if m]
+            setattr(self.result, field, bullets or ([text] if text else []))
+        else:
+            setattr(self.result, field, text)
+        self.completed.add(field)
+        if self._part >= 2:
+            # Past the legal analysis, a missing section or confidence will not appear any more
+            self.completed.update(('section', 'confidence'))
+
+def parse_response(text):
+    """Parse a complete answer into a LegalAnalysis"""
+    parser = StreamingResponseParser()
+    parser.feed(text)
+    return parser.finish()
@@ -0,0 +1,189 @@
+"""
+Semantic query cache for the PINGGG legal model
+
+Embeds incoming queries with a small local encoder and looks them up in a
+bounded in-memory vector index, so paraphrases of an earlier query reuse its
+analysis instead of waiting seconds for a new generation.
+
+Embedding similarity alone misses the details that change the legal answer,
+so a hit also needs the same negations, the same self-defence wording and the
+same parties in the same order.
+"""
+
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# The cache needs a sentence model; hashed n-grams score legally different queries as paraphrases
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+DEFAULT_ENCODER_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+DEFAULT_CAPACITY = 1000
+HASHING_DIMENSIONS = 2048
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+NEGATION_PATTERN = re.compile(
+    r"\b(?:not|no|never|nobody|nothing|neither|nor|without|denied|denies|\w+n't)\b", re.IGNORECASE
+)
+DEFENSE_PATTERN = re.compile(
+    r"\b(?:self[\s-]*defen[cs]e|private\s+defen[cs]e|in\s+defen[cs]e|defending|protect(?:ing|ed)?\s+(?:him|her|them)sel(?:f|ves))\b",
+    re.IGNORECASE
+)
+# "Person A", role nouns, and capitalized words that do not start a sentence
+PARTY_PATTERN = re.compile(
+    r"\b(?P<person>(?i:person\s+[a-z]))\b"
+    r"|\b(?P<role>(?i:accused|victim|complainant|husband|wife|employer|employee|landlord|tenant|owner))\b"
+    r"|(?<![.!?]\s)(?<!^)\b(?P<name>[A-Z][a-z]+)\b"
+)
+
+def query_signature(query):
+    """Negations, self-defence wording and parties in order of first mention
+
+    Two queries can only share an answer when their signatures are equal:
+    "A killed B" and "B killed A", or an attack with and without self-defence,
+    embed almost identically but are different cases.
+    """
+    negations = tuple(sorted(match.group(0).lower() for match in NEGATION_PATTERN.finditer(query)))
+    parties = []
+    for match in PARTY_PATTERN.finditer(query.strip()):
+        party = " ".join(match.group(0).lower().split())
+        if party not in parties:
+            parties.append(party)
+    return negations, bool(DEFENSE_PATTERN.search(query)), tuple(parties)
+
+class HashingEncoder:
+    """Dependency-free encoder: hashed word, word-bigram and character-trigram counts, L2 normalized
+
+    It only recognises close rewordings and is never picked by default_encoder;
+    pass it explicitly, e.g. for offline experiments.
+    """
+
+    default_threshold = 0.85
+
+    def __init__(self, dimensions=HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def features(self, text):
+        words = WORD_PATTERN.findall(text.lower())
+        features = list(words)
+        features += [a + ' ' + b for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self.features(text):
+                vectors[row, zlib.crc32(feature.encode('utf-8')) % self.dimensions] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+class SentenceEncoder:
+    """Small sentence-transformers model producing normalized embeddings"""
+
+    default_threshold = 0.9
+
+    def __init__(self, model_name=DEFAULT_ENCODER_MODEL):
+        self.model = SentenceTransformer(model_name)
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        return np.asarray(self.model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+def default_encoder():
+    """The sentence-transformers encoder; raises RuntimeError when it is not installed or cannot load"""
+    if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        raise RuntimeError("The semantic cache needs sentence-transformers (pip install sentence-transformers)")
+    try:
+        return SentenceEncoder()
+    except Exception as e:
+        raise RuntimeError(f"Could not load {DEFAULT_ENCODER_MODEL}: {e}") from e
+
+class SemanticCache:
+    """Bounded in-memory vector index of past queries and their analyses
+
+    Lookups are one matrix-vector product over the stored embeddings, limited
+    to entries with the same query_signature. When the index is full, the
+    least recently used entry is overwritten.
+    """
+
+    def __init__(self, encoder=None, threshold=None, capacity=DEFAULT_CAPACITY):
+        self.encoder = encoder or default_encoder()
+        self.threshold = threshold if threshold is not None else self.encoder.default_threshold
+        self.capacity = capacity
+        self.vectors = np.zeros((capacity, self.encoder.dimensions), dtype=np.float32)
+        self.entries = []  # (query, result) per row
+        self.signatures = []  # query_signature per row
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def embed(self, query):
+        return self.encoder.encode([query])[0]
+
+    def lookup(self, query, vector=None):
+        """Best stored match above the threshold as a dict, or None"""
+        if vector is None:
+            vector = self.embed(query)
+        signature = query_signature(query)
+        with self._lock:
+            size = len(self.entries)
+            if size:
+                similarities = self.vectors[:size] @ vector
+                similarities[[row for row in range(size) if self.signatures[row] != signature]] = -1.0
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.last_used[best] = time.monotonic()
+                    self.hits += 1
+                    cached_query, result = self.entries[best]
+                    return {
+                        "result": result,
+                        "cached": True,
+                        "matched_query": cached_query,
+                        "similarity": float(similarities[best])
+                    }
+            self.misses += 1
+            return None
+
+    def add(self, query, result, vector=None):
+        """Store a query's analysis, evicting the least recently used entry when full"""
+        if vector is None:
+            vector = self.embed(query)
+        signature = query_signature(query)
+        with self._lock:
+            if len(self.entries) < self.capacity:
+                row = len(self.entries)
+                self.entries.append((query, result))
+                self.signatures.append(signature)
+            else:
+                row = int(np.argmin(self.last_used))
+                self.entries[row] = (query, result)
+                self.signatures[row] = signature
+                self.evictions += 1
+            self.vectors[row] = vector
+            self.last_used[row] = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "capacity": self.capacity,
+                "evictions": self.evictions,
+                "encoder": type(self.encoder).__name__
+            }
@@ -0,0 +1,105 @@
+"""
+Conversation session for the PINGGG legal model
+
+Carries the `context` Ollama returns from one turn into the next, so the long
+SYSTEM prompt and earlier turns are not evaluated again, and keeps the model
+loaded between queries with `keep_alive`.
+"""
+
+DEFAULT_KEEP_ALIVE = '30m'
+# The Modelfile sets num_ctx 8192; leave room for the next question and a full answer
+DEFAULT_CONTEXT_BUDGET = 6144
+
+class ChatSession:
+    """Token-budgeted context carried across turns
+
+    Ollama's context is the token sequence of the whole conversation so far.
+    When it grows past context_budget, the oldest turns after the first are
+    dropped as a sliding window; the first turn is kept because it holds the
+    system prompt.
+    """
+
+    def __init__(self, keep_alive=DEFAULT_KEEP_ALIVE, context_budget=DEFAULT_CONTEXT_BUDGET):
+        self.keep_alive = keep_alive
+        self.context_budget = context_budget
+        self.context = None
+        self.turn_ends = []  # Context length at the end of each kept turn
+        self.turns = []
+        self.dropped_turns = 0
+
+    def request_options(self):
+        """Extra /api/generate fields for the next turn"""
+        return {'context': self.context, 'keep_alive': self.keep_alive}
+
+    def record(self, final):
+        """Take the context from a turn's final response and return the turn's token stats
+
+        Tokens in the request that Ollama did not have to evaluate again
+        (the input length minus prompt_eval_count) are reported as reused.
+        """
+        context = final.get('context')
+        prompt_eval = final.get('prompt_eval_count')
+        generated = final.get('eval_count')
+
+        reused = None
+        if context is not None and prompt_eval is not None and generated is not None:
+            reused = max(0, len(context) - generated - prompt_eval)
+        stats = {
+            'prompt_eval_tokens': prompt_eval,
+            'reused_tokens': reused,
+            'context_tokens': len(context) if context is not None else None
+        }
+        self.turns.append(stats)
+
+        if context:
+            self.context = list(context)
+            self.turn_ends.append(len(self.context))
+            self.trim()
+            stats['context_tokens'] = len(self.context)
+        return stats
+
+    def trim(self):
+        """Drop whole turns after the first until the context fits the budget"""
+        if len(self.context) <= self.context_budget:
+            return
+        first_end = self.turn_ends[0]
+        total = len(self.context)
+        for k in range(1, len(self.turn_ends)):
+            if first_end + total - self.turn_ends[k] <= self.context_budget:
+                break
+        else:
+            # Even the first turn alone does not fit: start over without context
+            self.dropped_turns += len(self.turn_ends)
+            self.reset()
+            return
+
+        cut = self.turn_ends[k]
+        self.context = self.context[:first_end] + self.context[cut:]
+        self.turn_ends = [first_end] + [end - cut + first_end for end in self.turn_ends[k + 1:]]
+        self.dropped_turns += k
+
+    def reset(self):
+        self.context = None
+        self.turn_ends = []
+
+    def summary(self):
+        """Totals over all turns of the session"""
+        reused = sum(turn['reused_tokens'] or 0 for turn in self.turns)
+        evaluated = sum(turn['prompt_eval_tokens'] or 0 for turn in self.turns)
+        return {
+            'turns': len(self.turns),
+            'prompt_eval_tokens': evaluated,
+            'reused_tokens': reused,
+            'dropped_turns': self.dropped_turns
+        }
+
+def format_turn_stats(stats):
+    """One-line summary of a turn's context reuse"""
+    parts = []
+    if stats['prompt_eval_tokens'] is not None:
+        parts.append(f"prompt eval: {stats['prompt_eval_tokens']} tokens")
+    if stats['reused_tokens'] is not None:
+        parts.append(f"saved: {stats['reused_tokens']} tokens")
+    if stats['context_tokens'] is not None:
+        parts.append(f"context: {stats['context_tokens']} tokens")
+    return "[" + " | ".join(parts) + "]" if parts else ""
@@ -12,6 +12,12 @@ files_to_upload = [
     "Modelfile",
     "README.md",
     "legal_analyzer.py",
+    "ollama_client.py",
+    "response_cache.py",
+    "semantic_cache.py",
+    "response_parser.py",
+    "session.py",
+    "prompt_builder.py",
     "ipc_sec_dataset.csv"
 ]
 